@@ -0,0 +1,120 @@
+"""Benchmark for the dashboard rollups (services/rollups.py).
+
+Bulk-inserts synthetic full scans for one portfolio over two days of one week,
+backfills the rollups (and re-runs the backfill to check it's idempotent), then
+compares dashboard reads against aggregating the raw scans per request, and
+measures what rollup maintenance adds to record_scan.
+
+    python benchmarks/bench_rollups.py --sites 50000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from services.scan_store import ScanStore
+
+BUSINESS_TYPES = ('restaurant', 'real_estate', 'retail', 'healthcare', 'legal', 'education', 'default')
+TITLES = ('Images Missing Alt Text', 'Missing or Empty Page Title', 'Form Fields Without Labels',
+          'Improper Heading Structure', 'Non-Descriptive Link Text', 'Missing Skip Navigation Links',
+          'Missing Language Declaration', 'Insufficient Color Contrast')
+RISK_LEVELS = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+WEEK = '2026-10-12'
+
+
+def _result(rng, site, day):
+    issues = rng.sample(TITLES, rng.randint(0, 6))
+    score = max(0, 100 - 12 * len(issues))
+    return {
+        'scan_id': f'{site}-{day}',
+        'url': f'https://site{site}.example/',
+        'grade': 'ABCDF'[min(4, (100 - score) // 10)],
+        'compliance_score': score,
+        'risk_level': rng.choice(RISK_LEVELS),
+        'analysis_type': 'full',
+        'detailed_issues': [{'title': title, 'description': 'x' * 200} for title in issues],
+        'timestamp': f'2026-10-{12 + day:02d}T10:{site % 60:02d}:00'
+    }
+
+
+def _timings(fn, runs=200):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return f'p50 {statistics.median(timings):.2f}ms p99 {timings[int(runs * 0.99) - 1]:.2f}ms'
+
+
+def _naive_dashboard(conn, portfolio_id):
+    # Latest scan per site in the week, aggregated from the raw results on every read
+    latest = {}
+    for url, score, result, created_at in conn.execute(
+            "SELECT url, compliance_score, result, created_at FROM scans WHERE portfolio_id = ? "
+            "AND analysis_type = 'full' AND created_at >= ? AND created_at < date(?, '+7 days')",
+            (portfolio_id, WEEK, WEEK)):
+        if url not in latest or created_at > latest[url][2]:
+            latest[url] = (score, result, created_at)
+    issues = {}
+    for score, result, created_at in latest.values():
+        for issue in json.loads(result)['detailed_issues']:
+            issues[issue['title']] = issues.get(issue['title'], 0) + 1
+    return len(latest), issues
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sites', type=int, default=50000, help='Sites; each is scanned on two days')
+    parser.add_argument('--live', type=int, default=2000, help='Scans recorded through record_scan')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    store = ScanStore(os.path.join(tempfile.mkdtemp(), 'scans.db'))
+    conn = store._conn()
+    rows = []
+    for day in (0, 2):
+        for site in range(args.sites):
+            result = _result(rng, site, day)
+            rows.append((result['scan_id'], result['url'], 'h', None, 'full', BUSINESS_TYPES[site % 7], '3',
+                         result['grade'], result['compliance_score'], result['risk_level'], json.dumps(result),
+                         result['timestamp'], 'agency-1'))
+    with conn:
+        conn.executemany('INSERT INTO scans (scan_id, url, host, snapshot_hash, analysis_type, business_type, '
+                         'ruleset_version, grade, compliance_score, risk_level, result, created_at, portfolio_id) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    started = time.perf_counter()
+    applied = store.backfill_rollups()
+    elapsed = time.perf_counter() - started
+    print(f'backfill   {applied} scans in {elapsed:.1f}s ({applied / elapsed:.0f}/s)')
+    totals = 'SELECT SUM(sites), SUM(score_sum) FROM rollups'
+    before = conn.execute(totals).fetchone()
+    started = time.perf_counter()
+    store.backfill_rollups()
+    print(f're-run     {time.perf_counter() - started:.1f}s, totals unchanged: {conn.execute(totals).fetchone() == before}')
+
+    dashboard = store.dashboard('agency-1', analysis_type='full', period='week', period_start=WEEK)
+    print('dashboard  week', _timings(lambda: store.dashboard('agency-1', analysis_type='full', period='week',
+                                                               period_start=WEEK)))
+    print('dashboard  day ', _timings(lambda: store.dashboard('agency-1', analysis_type='full', period='day',
+                                                               period_start='2026-10-14', business_type='retail')))
+    started = time.perf_counter()
+    sites, issues = _naive_dashboard(conn, 'agency-1')
+    print(f'naive      {(time.perf_counter() - started) * 1000:.0f}ms, same sites and issue counts: '
+          f"{sites == dashboard['sites'] and issues == {i['issue']: i['sites'] for i in dashboard['top_issues']}}")
+
+    started = time.perf_counter()
+    for site in range(args.live):
+        store.record_scan(_result(rng, site, 4), None, BUSINESS_TYPES[site % 7], 'agency-1')
+    print(f'record     {(time.perf_counter() - started) / args.live * 1000:.2f}ms per scan, rollups included')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark for snapshot storage and the bulk re-score job (services/scan_store.py, services/rescore.py).
+
+Generates pages for a number of synthetic sites, stores each one the way a live
+scan does (analyze, put_snapshot, record_scan), then reports snapshot storage per
+100k pages against plain zlib and re-scores every stored scan.
+
+    python benchmarks/bench_snapshots.py --sites 50 --pages 100 --workers 1
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from routes.compliance import AccessibilityAnalyzer
+from services.rescore import run_rescore
+from services.scan_store import ScanStore
+
+
+def _page(rng, site, number):
+    nav = ''.join(f'<li><a href="/{site}/c{j}">Category {j}</a></li>' for j in range(25))
+    body = ''.join(f'<p>{rng.choice(("Fresh", "Local", "Seasonal", "Hand made"))} item {rng.randint(1, 10 ** 6)} '
+                   f'for page {number}.</p>' for _ in range(rng.randint(10, 30)))
+    alt = ' alt="Product photo"' if rng.random() < 0.6 else ''
+    return (f'<html lang="en"><head><title>Site {site} page {number}</title>'
+            f'<link rel="stylesheet" href="/{site}/style.css"></head><body>'
+            f'<header class="site-{site}"><img src="/{site}/logo.png" alt="Site {site}"><nav><ul>{nav}</ul></nav></header>'
+            f'<main><h1>Page {number}</h1>{body}<img src="/{site}/p{number}.jpg"{alt}>'
+            f'<form><label for="q{number}">Search</label><input id="q{number}"><input name="email"></form></main>'
+            f'<footer>' + ''.join(f'<a href="/{site}/f{j}">Footer link {j}</a>' for j in range(20))
+            + '</footer></body></html>')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sites', type=int, default=50)
+    parser.add_argument('--pages', type=int, default=100, help='Pages per site')
+    parser.add_argument('--workers', type=int, default=1, help='Re-score processes')
+    parser.add_argument('--analysis-type', choices=('quick', 'full'), default='full')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    store = ScanStore(os.path.join(tempfile.mkdtemp(), 'scans.db'))
+    analyzer = AccessibilityAnalyzer(store=store)
+
+    pages = [(f'https://site{site}.example/p{number}', _page(rng, site, number))
+             for site in range(args.sites) for number in range(args.pages)]
+    started = time.perf_counter()
+    for url, html in pages:
+        elements = {}
+        result = analyzer.analyze_html(url, html, 'retail', args.analysis_type, elements=elements)
+        analyzer._record(result, html, 'retail', elements=elements)
+    ingest = time.perf_counter() - started
+
+    stats = store.stats()
+    plain = sum(len(zlib.compress(html.encode(), 9)) for url, html in pages)
+    per_100k = stats['stored_bytes'] / len(pages) * 100000 / 2 ** 20
+    print(f"{len(pages)} pages, {stats['raw_bytes'] / len(pages) / 1024:.1f} KB each")
+    print(f"snapshots  {stats['stored_bytes'] / 2 ** 20:.2f} MB incl. dictionaries, ratio {stats['compression_ratio']}x "
+          f"(plain zlib -9: {stats['raw_bytes'] / plain:.1f}x), ~{per_100k:.0f} MB per 100k pages")
+    print(f'ingest     {len(pages) / ingest:.0f} pages/s (analyze + store)')
+
+    report = run_rescore(store.path, analysis_type=args.analysis_type, workers=args.workers)
+    print(f"rescore    {report['pages_per_sec']} pages/s on {args.workers} worker(s), "
+          f"{report['rescored']} re-scored, {report['changed']} changed, {report['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
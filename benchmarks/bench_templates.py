@@ -0,0 +1,75 @@
+"""Benchmark for template deduplication in multi-page audits (AccessibilityAnalyzer.analyze_pages).
+
+Generates one site whose pages share a large header/nav, footer and cookie banner,
+then analyzes every page on its own and with analyze_pages, reporting both timings
+and whether each page got the same grade and score both ways.
+
+    python benchmarks/bench_templates.py --pages 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from routes.compliance import AccessibilityAnalyzer
+
+
+def _site(pages, seed=2):
+    rng = random.Random(seed)
+    nav = ''.join(f'<li><a href="/c{j}">Category {j}</a><ul>'
+                  + ''.join(f'<li><a href="/c{j}/{k}">Sub {k}</a></li>' for k in range(8)) + '</ul></li>'
+                  for j in range(15))
+    header = ('<header class="site-header"><img src="/logo.png"><a href="#main">Skip to main content</a>'
+              f'<nav><ul>{nav}</ul></nav><form class="search"><input name="q" type="search"><button>Go</button></form>'
+              '</header>')
+    footer = ('<footer><div class="newsletter"><input type="email" name="email" placeholder="Email">'
+              '<button>Subscribe</button></div>' + ''.join(f'<a href="/f{j}">more</a>' for j in range(30))
+              + '<img src="/badge.png"></footer>'
+              '<div id="cookie-banner"><p>We use cookies</p><button>OK</button><a href="/privacy">here</a></div>')
+
+    def page(number):
+        body = ''.join(f'<p>Unique text {rng.random()} for page {number}.</p>' for _ in range(20))
+        body += (f'<img src="/p/{number}.jpg"{" alt=x" if number % 2 else ""}>'
+                 f'<label for="f{number}">Name</label><input id="f{number}">')
+        return (f'<html lang="en"><head><title>Page {number}</title></head><body>{header}'
+                f'<main id="main"><h1>Page {number}</h1>{body}</main>{footer}</body></html>')
+
+    return [(f'https://shop.example/p{number}', page(number)) for number in range(pages)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=1000)
+    args = parser.parse_args()
+
+    pages = _site(args.pages)
+    analyzer = AccessibilityAnalyzer()
+    # Warm up imports and selector caches so they don't land in the first timing
+    analyzer.analyze_html(*pages[0], 'retail', 'full')
+    for analysis_type in ('quick', 'full'):
+        started = time.perf_counter()
+        alone = [analyzer.analyze_html(url, html, 'retail', analysis_type) for url, html in pages]
+        naive = time.perf_counter() - started
+
+        started = time.perf_counter()
+        site = analyzer.analyze_pages(pages, 'retail', analysis_type)
+        deduplicated = time.perf_counter() - started
+
+        mismatched = sum((page['grade'], page['compliance_score']) != (single['grade'], single['compliance_score'])
+                         for page, single in zip(site['pages'], alone))
+        print(f'{analysis_type:<5} one by one {naive:.2f}s  analyze_pages {deduplicated:.2f}s '
+              f'({naive / deduplicated:.1f}x)  template blocks {len(site["template_blocks"])}  '
+              f'grade/score mismatches {mismatched}/{len(pages)}')
+        if analysis_type == 'full':
+            # Template examples are listed once for the site instead of on every page
+            def examples(results):
+                return round(sum(len(issue['examples']) for page in results for issue in page['detailed_issues'])
+                             / len(results), 1)
+            print(f'      examples per page: one by one {examples(alone)}, analyze_pages {examples(site["pages"])}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Load test for the admission lanes (services/admission.py).
+
+Starts a local site server and the app in-process, then runs one scenario per
+subprocess so lane state never leaks between them:
+
+  idle        quick-scan probe alone
+  off         probe while clients flood /api/full-analysis, admission control disabled
+  on          the same flood with admission control
+  slow-sites  idle server, quick scans of sites that take --site-delay to download;
+              lane limits should stay where they started
+
+    python benchmarks/load_admission.py --duration 25 --clients 12
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+SCENARIOS = ('idle', 'off', 'on', 'slow-sites')
+
+SMALL_PAGE = b'<html lang="en"><title>x</title><body><h1>a</h1><img src="a.png" alt="b"></body></html>'
+# Roughly 400ms of parsing and checking per full analysis
+BIG_PAGE = ('<html><title>x</title><body>'
+            + ''.join(f'<div><p>text</p><a href="/a">more</a><img src="x.png"><input id="i{i}"></div>' for i in range(300))
+            + '</body></html>').encode()
+
+
+def _site_server(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if 'slow' in self.path:
+                time.sleep(delay)
+            body = BIG_PAGE if 'big' in self.path else SMALL_PAGE
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def _post(base, path, url):
+    request = urllib.request.Request(base + path, data=json.dumps({'url': url}).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    try:
+        urllib.request.urlopen(request, timeout=120).read()
+        code = 200
+    except urllib.error.HTTPError as e:
+        code = e.code
+    return code, time.perf_counter() - started
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000) if ordered else None
+
+
+def run_scenario(scenario, duration, clients, site_delay):
+    os.environ['SCAN_STORE_PATH'] = os.path.join(tempfile.mkdtemp(), 'scans.db')
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    from main import app
+    from services.admission import admission
+
+    if scenario == 'off':
+        for lane in admission._lanes.values():
+            lane.limit = lane.min_limit = lane.max_limit = 10 ** 6
+    initial = {name: lane['limit'] for name, lane in admission.stats()['lanes'].items()}
+
+    site = _site_server(site_delay)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    stop = time.time() + duration
+    full_codes = {}
+
+    def flood(client):
+        sent = 0
+        while time.time() < stop:
+            code, _ = _post(base, '/api/full-analysis', f'{site}/big{client}_{sent}')
+            sent += 1
+            full_codes[code] = full_codes.get(code, 0) + 1
+            if code == 503:
+                time.sleep(0.2)
+
+    flooders = [threading.Thread(target=flood, args=(client,)) for client in range(clients if scenario in ('off', 'on') else 0)]
+    for thread in flooders:
+        thread.start()
+    if flooders:
+        time.sleep(3)
+
+    latencies = []
+    quick_codes = {}
+    path = 'slow' if scenario == 'slow-sites' else 'small'
+    # Several probes at once for slow sites, the way a traffic spike would arrive
+    probes = 5 if scenario == 'slow-sites' else 1
+
+    def probe(number):
+        while time.time() < stop:
+            code, latency = _post(base, '/api/quick-scan', f'{site}/{path}{number}_{len(latencies)}')
+            quick_codes[code] = quick_codes.get(code, 0) + 1
+            latencies.append(latency)
+            time.sleep(0.2)
+
+    probers = [threading.Thread(target=probe, args=(number,)) for number in range(probes)]
+    for thread in probers:
+        thread.start()
+    for thread in probers + flooders:
+        thread.join()
+
+    return {
+        'scenario': scenario,
+        'quick': {'requests': len(latencies), 'codes': quick_codes,
+                  'p50_ms': _percentile(latencies, 50), 'p99_ms': _percentile(latencies, 99)},
+        'full_codes': full_codes,
+        'initial_limits': initial,
+        'final_limits': {name: lane['limit'] for name, lane in admission.stats()['lanes'].items()},
+        'admission': admission.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=SCENARIOS, help='Run one scenario in this process')
+    parser.add_argument('--duration', type=float, default=25.0, help='Seconds per scenario')
+    parser.add_argument('--clients', type=int, default=12, help='Concurrent full-analysis clients')
+    parser.add_argument('--site-delay', type=float, default=1.2, help='Download time of slow sites (seconds)')
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(args.scenario, args.duration, args.clients, args.site_delay)))
+        return
+
+    for scenario in SCENARIOS:
+        output = subprocess.run(
+            [sys.executable, __file__, '--scenario', scenario, '--duration', str(args.duration),
+             '--clients', str(args.clients), '--site-delay', str(args.site_delay)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        quick = report['quick']
+        print(f"{scenario:<11} quick p50 {quick['p50_ms']}ms p99 {quick['p99_ms']}ms {quick['codes']}  "
+              f"full {report['full_codes']}  limits {report['initial_limits']} -> {report['final_limits']}")
+
+
+if __name__ == '__main__':
+    main()
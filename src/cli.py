@@ -0,0 +1,92 @@
+import argparse
+import json
+import sys
+import time
+
+from services.bulk_scan import run_bulk_scan
+from services.rescore import run_rescore
+from services.scan_store import ScanStore
+
+
+def bulk_scan(args):
+    output = open(args.output, 'w', newline='') if args.output != '-' else sys.stdout
+    try:
+        summary = run_bulk_scan(
+            args.paths,
+            output=output,
+            fmt=args.format,
+            analysis_type=args.type,
+            business_type=args.business_type,
+            workers=args.workers,
+            base_url=args.base_url
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+def rescore(args):
+    report = run_rescore(
+        store_path=args.store,
+        analysis_type=args.type,
+        workers=args.workers,
+        record=args.record,
+        limit=args.limit
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def rollup_backfill(args):
+    started = time.perf_counter()
+    applied = ScanStore(args.store).backfill_rollups(since=args.since, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'scans_applied': applied,
+        'elapsed_seconds': round(elapsed, 3),
+        'scans_per_sec': round(applied / elapsed, 2) if elapsed > 0 else 0.0
+    }, indent=2))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='ADA Compliance Checker command line tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan = subparsers.add_parser('bulk-scan', help='Analyze saved HTML directories or WARC archives offline')
+    scan.add_argument('paths', nargs='+', help='HTML files, directories, .warc or .warc.gz archives')
+    scan.add_argument('--type', choices=['quick', 'full'], default='quick', help='Analysis type (default: quick)')
+    scan.add_argument('--business-type', default='default', help='Business type for risk factors')
+    scan.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='Output format (default: jsonl)')
+    scan.add_argument('--output', '-o', default='-', help='Output file (default: stdout)')
+    scan.add_argument('--workers', '-j', type=int, default=None, help='Worker processes (default: all cores)')
+    scan.add_argument('--base-url', default=None, help='Map files under a directory to URLs under this base')
+    scan.set_defaults(func=bulk_scan)
+
+    regrade = subparsers.add_parser('rescore', help='Re-grade stored snapshots under the current rules')
+    regrade.add_argument('--store', default=None, help='Scan store database (default: SCAN_STORE_PATH)')
+    regrade.add_argument('--type', choices=['quick', 'full'], default=None, help='Only re-grade this analysis type')
+    regrade.add_argument('--workers', '-j', type=int, default=None, help='Worker processes (default: all cores)')
+    regrade.add_argument('--limit', type=int, default=None, help='Stop after this many scans')
+    regrade.add_argument('--record', action='store_true', help='Save the new results as scans')
+    regrade.set_defaults(func=rescore)
+
+    backfill = subparsers.add_parser('rollup-backfill', help='Rebuild dashboard rollups from stored scans')
+    backfill.add_argument('--store', default=None, help='Scan store database (default: SCAN_STORE_PATH)')
+    backfill.add_argument('--since', default=None, help='Only scans created on or after this date (YYYY-MM-DD)')
+    backfill.add_argument('--batch-size', type=int, default=1000, help='Scans per transaction (default: 1000)')
+    backfill.set_defaults(func=rollup_backfill)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,8 +5,18 @@ import requests
 from bs4 import BeautifulSoup
 import re
 
+from routes.compliance import analyzer, compliance_bp
+from services.admission import admitted
+from services.host_health import HostCircuitOpen, host_health
+from services.rules import Document, rules
+
+# Rules the landing-page analysis runs, in report order (see services/rules.py)
+ANALYZE_RULES = ('images_without_alt', 'missing_page_title', 'improper_heading_structure', 'forms_without_labels',
+                 'non_descriptive_links')
+
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(compliance_bp)
 
 @app.route('/')
 def home():
@@ -266,6 +276,7 @@ def home():
     '''
 
 @app.route('/analyze', methods=['POST'])
+@admitted(lambda: 'full' if (request.get_json(silent=True) or {}).get('type') == 'full' else 'quick')
 def analyze_website():
     try:
         data = request.get_json()
@@ -288,106 +299,24 @@ def analyze_website():
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
+        response = host_health.get(url, headers=headers, timeout=15, allow_redirects=True)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.content, 'html.parser')
         
         # Perform accessibility analysis
         issues = []
-        
-        # Check 1: Images without alt text
-        images = soup.find_all('img')
-        images_without_alt = [img for img in images if not img.get('alt') or img.get('alt').strip() == '']
-        if images_without_alt:
-            issues.append({
-                'type': 'Missing Alt Text',
-                'severity': 'High',
-                'count': len(images_without_alt),
-                'description': f'{len(images_without_alt)} images missing descriptive alt text (WCAG 1.1.1)'
-            })
-        
-        # Check 2: Missing page title
-        title = soup.find('title')
-        if not title or not title.get_text().strip():
-            issues.append({
-                'type': 'Missing Page Title',
-                'severity': 'High',
-                'count': 1,
-                'description': 'Page is missing a descriptive title (WCAG 2.4.2)'
-            })
-        
-        # Check 3: Heading structure
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        h1_count = len(soup.find_all('h1'))
-        
-        if not headings:
-            issues.append({
-                'type': 'No Heading Structure',
-                'severity': 'Medium',
-                'count': 1,
-                'description': 'Page lacks proper heading structure for screen readers (WCAG 1.3.1)'
-            })
-        elif h1_count == 0:
-            issues.append({
-                'type': 'Missing H1 Heading',
-                'severity': 'Medium',
-                'count': 1,
-                'description': 'Page missing main H1 heading (WCAG 1.3.1)'
-            })
-        elif h1_count > 1:
-            issues.append({
-                'type': 'Multiple H1 Headings',
-                'severity': 'Medium',
-                'count': h1_count,
-                'description': f'Page has {h1_count} H1 headings, should have only one (WCAG 1.3.1)'
-            })
-        
-        # Check 4: Form labels
-        inputs = soup.find_all(['input', 'textarea', 'select'])
-        inputs_without_labels = []
-        for input_elem in inputs:
-            input_type = input_elem.get('type', '').lower()
-            if input_type in ['hidden', 'submit', 'button']:
-                continue
-            
-            input_id = input_elem.get('id')
-            aria_label = input_elem.get('aria-label')
-            aria_labelledby = input_elem.get('aria-labelledby')
-            
-            has_label = False
-            if input_id:
-                label = soup.find('label', {'for': input_id})
-                if label:
-                    has_label = True
-            
-            if not has_label and not aria_label and not aria_labelledby:
-                inputs_without_labels.append(input_elem)
-        
-        if inputs_without_labels:
-            issues.append({
-                'type': 'Form Inputs Without Labels',
-                'severity': 'High',
-                'count': len(inputs_without_labels),
-                'description': f'{len(inputs_without_labels)} form inputs missing proper labels (WCAG 1.3.1)'
-            })
-        
-        # Check 5: Links without descriptive text
-        links = soup.find_all('a', href=True)
-        vague_links = []
-        vague_text = ['click here', 'read more', 'more', 'here', 'link', 'this']
-        
-        for link in links:
-            link_text = link.get_text().strip().lower()
-            if link_text in vague_text or len(link_text) < 3:
-                vague_links.append(link)
-        
-        if vague_links:
+        for failure in rules.run(Document(soup), ANALYZE_RULES):
+            guideline = analyzer.wcag_guidelines[failure['key']]
+            if failure['elements']:
+                detail = f"{failure['summary']}: {failure['count']}"
+            else:
+                detail = failure['examples'][0]
             issues.append({
-                'type': 'Non-Descriptive Link Text',
-                'severity': 'Medium',
-                'count': len(vague_links),
-                'description': f'{len(vague_links)} links with vague text like "click here" (WCAG 2.4.4)'
+                'type': guideline['title'],
+                'severity': 'High' if failure['severity'] == 'critical' else 'Medium',
+                'count': failure['count'],
+                'description': f"{detail} ({guideline['wcag_reference']})"
             })
         
         # Calculate grade
@@ -410,6 +339,8 @@ def analyze_website():
             'timestamp': response.headers.get('date', 'Unknown')
         })
         
+    except HostCircuitOpen as e:
+        return jsonify({'error': 'Website is currently unreachable. Please try again later.'}), 503, {'Retry-After': str(int(e.retry_after))}
     except requests.exceptions.Timeout:
         return jsonify({'error': 'Website took too long to respond. Please try again.'}), 408
     except requests.exceptions.ConnectionError:
@@ -1,15 +1,48 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, UnicodeDammit
 import re
 from urllib.parse import urljoin, urlparse
+import json
+import logging
+import os
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 from datetime import datetime
 
+from services.coalesce import RequestCoalescer
+from services.frames import SCAN_BUDGET, FrameCollector
+from services import profiling
+from services.admission import admission, admitted
+from services.host_health import host_health
+from services.profiling import section
+from services.rollups import ALL_SITES, PERIODS
+from services.rules import Document, rules
+from services.scan_store import ScanStore
+from services.templates import SiteTemplate, describe
+
 compliance_bp = Blueprint('compliance', __name__)
 
+# Bump whenever checks or scoring change so stored scans can be re-graded (see cli.py rescore)
+RULESET_VERSION = '3'
+
+# Rules each analysis runs, in report order (see services/rules.py)
+QUICK_RULES = ('images_without_alt', 'missing_page_title', 'forms_without_labels', 'improper_heading_structure')
+FULL_RULES = ('images_without_alt', 'missing_page_title', 'forms_without_labels', 'improper_heading_structure',
+              'non_descriptive_links', 'missing_skip_links', 'missing_lang_attribute', 'poor_color_contrast',
+              'inaccessible_focus_indicators')
+# Shared template blocks only get the per-element rules; page-level ones run on each page
+TEMPLATE_RULES = tuple(key for key in FULL_RULES if rules[key].scope == 'element')
+
+logger = logging.getLogger(__name__)
+
 class AccessibilityAnalyzer:
-    def __init__(self):
+    def __init__(self, coalescer=None, store=None):
+        self.coalescer = coalescer
+        self.store = store
         self.wcag_guidelines = {
             'images_without_alt': {
                 'title': 'Images Missing Alt Text',
@@ -61,6 +94,16 @@ class AccessibilityAnalyzer:
                 'priority': 'High',
                 'estimated_time': '10 minutes'
             },
+            'non_descriptive_links': {
+                'title': 'Non-Descriptive Link Text',
+                'description': 'Links named "click here" or with no name at all give screen reader users no idea where they lead, especially when listed out of context.',
+                'wcag_reference': 'WCAG 2.1 Level A - 2.4.4',
+                'severity': 'warning',
+                'fix_instruction': 'Give every link text (or an aria-label) that describes its destination. Icon links need alt text on the image or an aria-label.',
+                'code_example': '<a href="/menu">View our dinner menu</a>',
+                'priority': 'Medium',
+                'estimated_time': '15 minutes'
+            },
             'missing_skip_links': {
                 'title': 'Missing Skip Navigation Links',
                 'description': 'Skip links allow keyboard users to bypass repetitive navigation and jump directly to main content.',
@@ -138,21 +181,24 @@ class AccessibilityAnalyzer:
             ]
         }
 
-    def analyze_website(self, url, business_type='default', analysis_type='quick'):
+    def analyze_website(self, url, business_type='default', analysis_type='quick', scan_id=None, portfolio_id=None):
         try:
-            # Fetch the webpage
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            if analysis_type == 'quick':
-                return self._quick_analysis(url, soup, business_type)
+            # Frames share the scan's budget, which starts counting before the page fetch
+            deadline = time.monotonic() + SCAN_BUDGET
+            # Fetch and parse the webpage, sharing the work with concurrent scans of the same URL.
+            # Profiled scans always do their own fetch so the profile covers it.
+            if self.coalescer and not profiling.active():
+                html, soup = self.coalescer.get(url, self._fetch, self._parse_document)
             else:
-                return self._full_analysis(url, soup, business_type)
+                html, soup = self._parse_document(self._fetch(url))
+            
+            # Frames load in the background while the page itself is checked
+            frames = FrameCollector(url, soup, self._load_frame, self._parse_document, deadline)
+            elements = {}
+            result = self._run_analysis(url, soup, business_type, analysis_type, scan_id, elements=elements,
+                                        frames=frames)
+            self._record(result, html, business_type, portfolio_id, elements, frames.frames)
+            return result
                 
         except requests.RequestException as e:
             return {
@@ -167,43 +213,266 @@ class AccessibilityAnalyzer:
                 'timestamp': datetime.now().isoformat()
             }
 
-    def _quick_analysis(self, url, soup, business_type):
+    def analyze_html(self, url, html, business_type='default', analysis_type='quick', scan_id=None, elements=None,
+                     load_frame=None):
+        """Run the checks over an already-fetched document (bytes or str).
+
+        Pass a dict as elements to have it filled with the location of every offending
+        element, keyed by issue type. load_frame(url) replays the page's frames from
+        stored documents: it returns a frame's HTML, or None for frames that weren't kept.
+        """
+        try:
+            soup = self._parse(html)
+            frames = None
+            if load_frame is not None:
+                frames = FrameCollector(url, soup, partial(self._replay_frame, load_frame), self._parse_document,
+                                        time.monotonic() + SCAN_BUDGET)
+            return self._run_analysis(url, soup, business_type, analysis_type, scan_id, elements=elements,
+                                      frames=frames)
+        except Exception as e:
+            return {
+                'error': f'Analysis error: {str(e)}',
+                'url': url,
+                'timestamp': datetime.now().isoformat()
+            }
+
+    def analyze_site(self, urls, business_type='default', analysis_type='quick', max_workers=8):
+        """Audit several pages of one site, reporting shared template issues once."""
+        def fetch(url):
+            try:
+                return url, self._fetch(url), None
+            except requests.RequestException as e:
+                return url, None, f'Unable to access website: {str(e)}'
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls)) or 1) as pool:
+            fetched = list(pool.map(fetch, urls))
+
+        result = self.analyze_pages([(url, html) for url, html, error in fetched if html is not None],
+                                    business_type, analysis_type)
+        result['pages'].extend({
+            'error': error,
+            'url': url,
+            'timestamp': datetime.now().isoformat()
+        } for url, html, error in fetched if html is None)
+        return result
+
+    def analyze_pages(self, pages, business_type='default', analysis_type='quick', sample_size=10):
+        """Analyze already-fetched (url, html) pages of one site with template deduplication.
+
+        Blocks repeated across pages (header, nav, footer, cookie banner...) are learned
+        from the first sample_size pages, checked once and reported under
+        template_issues. Each page's issue counts and score still include the template
+        blocks it contains, so a page grades the same as when analyzed on its own, but
+        their examples are only listed under template_issues: a page's issue says how many
+        of its instances are in the template (template_count). Page-level checks (title,
+        headings, lang...) see the whole page.
+        """
+        markups = [html if isinstance(html, str) else UnicodeDammit(html, is_html=True).unicode_markup
+                   for url, html in pages]
+        sample = [(markup, self._parse(markup)) for markup in markups[:sample_size]]
+        with section('template_detection'):
+            template = SiteTemplate(sample)
+        block_failures = self._block_failures(template)
+        template_issues = self._template_issues(template, block_failures)
+
+        page_results = []
+        for index, (url, html) in enumerate(pages):
+            try:
+                if index < len(sample):
+                    soup, skip = sample[index][1], template.sample_skipper(index)
+                    blocks = template.sample_blocks(index)
+                else:
+                    soup = self._parse(template.reduce(markups[index]))
+                    blocks, skip = template.attach(soup)
+                shared = [(describe(block['element']), block_failures[id(block)]) for block in blocks]
+                page_results.append(self._run_analysis(url, soup, business_type, analysis_type, skip=skip,
+                                                       shared=shared))
+            except Exception as e:
+                page_results.append({
+                    'error': f'Analysis error: {str(e)}',
+                    'url': url,
+                    'timestamp': datetime.now().isoformat()
+                })
+
+        scores = [page['compliance_score'] for page in page_results if 'compliance_score' in page]
+        return {
+            'pages_analyzed': len(scores),
+            'template_blocks': [
+                {'block': describe(block['element']), 'pages': block['pages']}
+                for block in template.blocks
+            ],
+            'template_issues': template_issues,
+            'average_compliance_score': round(sum(scores) / len(scores), 1) if scores else None,
+            'pages': page_results,
+            'timestamp': datetime.now().isoformat(),
+            'analysis_type': analysis_type
+        }
+
+    def _block_failures(self, template):
+        # Each shared block is checked once, in the page it was first seen on
+        failures = {}
+        docs = {}
+        for block in template.blocks:
+            doc = docs.setdefault(id(block['soup']), Document(block['soup']))
+            failures[id(block)] = rules.run(doc, TEMPLATE_RULES, root=block['element'])
+        return failures
+
+    def _template_issues(self, template, block_failures):
+        examples = {}
+        for block in template.blocks:
+            label = describe(block['element'])
+            for failure in block_failures[id(block)]:
+                examples.setdefault(failure['key'], []).extend(
+                    f'{example} in {label}' for example in failure['examples'])
+
         issues = []
-        critical_count = 0
-        warning_count = 0
-        
-        # Check for images without alt text
-        images = soup.find_all('img')
-        missing_alt = [img for img in images if not img.get('alt')]
-        if missing_alt:
-            issues.append('Images missing alt text')
-            critical_count += 1
-        
-        # Check page title
-        title = soup.find('title')
-        if not title or not title.get_text().strip():
-            issues.append('Missing or empty page title')
-            critical_count += 1
-        
-        # Check for form labels
-        inputs = soup.find_all(['input', 'textarea', 'select'])
-        unlabeled_inputs = []
-        for input_elem in inputs:
-            if input_elem.get('type') not in ['hidden', 'submit', 'button']:
-                input_id = input_elem.get('id')
-                if not input_id or not soup.find('label', {'for': input_id}):
-                    if not input_elem.find_parent('label'):
-                        unlabeled_inputs.append(input_elem)
-        
-        if unlabeled_inputs:
-            issues.append('Form fields without proper labels')
-            critical_count += 1
-        
-        # Check heading structure
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        if not headings:
-            issues.append('No heading structure found')
-            warning_count += 1
+        for key in TEMPLATE_RULES:
+            if key in examples:
+                issue_data = self.wcag_guidelines[key].copy()
+                issue_data['count'] = len(examples[key])
+                issue_data['examples'] = examples[key][:5]
+                issues.append(issue_data)
+        return issues
+
+    def _fetch(self, url, budget=None, html_only=False):
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        with section('fetch'):
+            response = host_health.get(url, headers=headers, timeout=10, budget=budget)
+            response.raise_for_status()
+        content_type = response.headers.get('Content-Type', 'text/html')
+        if html_only and 'html' not in content_type:
+            raise ValueError(f'Not an HTML document ({content_type})')
+        return response.content
+
+    def _load_frame(self, url, budget):
+        # Widgets embedded across a site are fetched once for all the scans that hit them
+        fetch = partial(self._fetch, budget=budget, html_only=True)
+        if self.coalescer:
+            return self.coalescer.get(url, fetch, self._parse_document, namespace='frame')
+        return self._parse_document(fetch(url))
+
+    def _replay_frame(self, load_frame, url, budget):
+        html = load_frame(url)
+        if html is None:
+            raise LookupError('Frame was not loaded when the page was scanned')
+        return self._parse_document(html)
+
+    def _parse(self, html):
+        with section('parse'):
+            return BeautifulSoup(html, 'html.parser')
+
+    def _parse_document(self, html):
+        return html, self._parse(html)
+
+    def _record(self, result, html, business_type, portfolio_id=None, elements=None, frames=()):
+        # Keep the fetched documents so the scan can be re-graded later without re-fetching
+        if not self.store:
+            return
+        try:
+            with section('store'):
+                snapshot_hash = self.store.put_snapshot(result['url'], html)
+                # srcdoc frames are part of the page's own snapshot
+                frame_snapshots = {
+                    frame['url']: self.store.put_snapshot(frame['url'], frame['html'])
+                    for frame in frames if frame['status'] == 'scanned' and frame['url'] != 'about:srcdoc'
+                }
+                self.store.record_scan(result, snapshot_hash, business_type, portfolio_id, elements,
+                                       frame_snapshots=frame_snapshots)
+        except Exception:
+            logger.exception('Failed to store snapshot for %s', result['url'])
+
+    def _run_analysis(self, url, soup, business_type, analysis_type, scan_id=None, skip=None, elements=None,
+                      frames=None, shared=()):
+        # The soup may be shared between coalesced requests, so analyses must not modify it.
+        # The frame collector has already walked the page; its Document shares that walk.
+        doc = frames.doc if frames is not None else Document(soup)
+        keys = QUICK_RULES if analysis_type == 'quick' else FULL_RULES
+        failures = rules.run(doc, keys, skip=skip)
+        if elements is not None:
+            with section('locate_elements'):
+                for failure in failures:
+                    if failure['elements']:
+                        elements[failure['key']] = [doc.locate(element) for element in failure['elements']]
+        if shared:
+            # Template blocks skipped above still count towards this page's score; their
+            # examples are reported once, under the site's template_issues
+            failures = self._merge_failures(keys, failures, shared, template=True)
+        if frames is not None:
+            with section('frames'):
+                loaded = frames.wait()
+                failures = self._merge_frames(doc, keys, failures, loaded, elements)
+        if analysis_type == 'quick':
+            result = self._quick_analysis(url, failures)
+        else:
+            result = self._full_analysis(url, failures, business_type)
+        if frames is not None:
+            result['frames'] = [self._frame_summary(frame) for frame in loaded]
+            result['frames_skipped'] = frames.skipped
+        result['scan_id'] = scan_id or uuid.uuid4().hex
+        result['ruleset_version'] = RULESET_VERSION
+        return result
+
+    def _merge_failures(self, keys, failures, extra, template=False):
+        """failures plus those of each (label, failures) in extra, one per key in report order.
+
+        With template=True the extra failures are shared template blocks: they add to the
+        count and to template_count, but not to the examples.
+        """
+        merged = {failure['key']: dict(failure, examples=list(failure['examples'])) for failure in failures}
+        for label, more in extra:
+            for failure in more:
+                if failure['key'] not in keys:
+                    continue
+                target = merged.setdefault(failure['key'], dict(failure, count=0, elements=[], examples=[]))
+                target['count'] += failure['count']
+                if template:
+                    target['template_count'] = target.get('template_count', 0) + failure['count']
+                else:
+                    target['examples'].extend(f'{example} in {label}' for example in failure['examples'])
+        return [merged[key] for key in keys if key in merged]
+
+    def _merge_frames(self, doc, keys, failures, frames, elements=None):
+        # Frames get the per-element rules; page-level ones (title, headings, lang...) are about the page
+        frame_keys = [key for key in keys if rules[key].scope == 'element']
+        extra = []
+        for frame in frames:
+            parent = frame['parent']
+            path = (parent['doc'] if parent else doc).css_path(frame['element'])
+            frame['selector'] = f"{parent['selector']} >>> {path}" if parent else path
+            if frame['status'] != 'scanned':
+                continue
+            frame_failures = rules.run(frame['doc'], frame_keys)
+            frame['issues'] = {failure['key']: failure['count'] for failure in frame_failures}
+            extra.append((f"frame {frame['url']}", frame_failures))
+            if elements is not None:
+                for failure in frame_failures:
+                    # Paths into a frame are chained through the frame elements with >>>
+                    elements.setdefault(failure['key'], []).extend(
+                        (f"{frame['selector']} >>> {path}", line, column, snippet)
+                        for path, line, column, snippet in map(frame['doc'].locate, failure['elements'])
+                    )
+        return self._merge_failures(keys, failures, extra)
+
+    def _frame_summary(self, frame):
+        summary = {
+            'url': frame['url'],
+            'selector': frame['selector'],
+            'depth': frame['depth'],
+            'origin': frame['origin'],
+            'status': frame['status']
+        }
+        if frame['status'] == 'scanned':
+            summary['issues'] = frame['issues']
+        elif frame['status'] == 'error':
+            summary['error'] = frame['error']
+        return summary
+
+    def _quick_analysis(self, url, failures):
+        issues = [failure['summary'] for failure in failures]
+        critical_count = sum(1 for failure in failures if failure['severity'] == 'critical')
+        warning_count = len(failures) - critical_count
         
         # Calculate scores
         total_issues = critical_count + warning_count
@@ -242,98 +511,25 @@ class AccessibilityAnalyzer:
             'analysis_type': 'quick'
         }
 
-    def _full_analysis(self, url, soup, business_type):
+    def _full_analysis(self, url, failures, business_type):
         detailed_issues = []
         critical_count = 0
         warning_count = 0
         
-        # Analyze images
-        images = soup.find_all('img')
-        missing_alt_images = []
-        for img in images:
-            if not img.get('alt'):
-                missing_alt_images.append(f"Image: {img.get('src', 'Unknown source')}")
-        
-        if missing_alt_images:
-            issue_data = self.wcag_guidelines['images_without_alt'].copy()
-            issue_data['examples'] = missing_alt_images[:5]  # Limit examples
-            detailed_issues.append(issue_data)
-            critical_count += 1
-        
-        # Analyze page title
-        title = soup.find('title')
-        if not title or not title.get_text().strip():
-            issue_data = self.wcag_guidelines['missing_page_title'].copy()
-            detailed_issues.append(issue_data)
-            critical_count += 1
-        
-        # Analyze form labels
-        inputs = soup.find_all(['input', 'textarea', 'select'])
-        unlabeled_inputs = []
-        for input_elem in inputs:
-            if input_elem.get('type') not in ['hidden', 'submit', 'button']:
-                input_id = input_elem.get('id')
-                if not input_id or not soup.find('label', {'for': input_id}):
-                    if not input_elem.find_parent('label'):
-                        input_type = input_elem.get('type', 'text')
-                        unlabeled_inputs.append(f"{input_type.title()} input without label")
-        
-        if unlabeled_inputs:
-            issue_data = self.wcag_guidelines['forms_without_labels'].copy()
-            issue_data['examples'] = unlabeled_inputs[:5]
+        for failure in failures:
+            issue_data = self.wcag_guidelines[failure['key']].copy()
+            # Every offending element is at /api/scans/<scan_id>/issues/<issue_type>
+            issue_data['issue_type'] = failure['key']
+            issue_data['count'] = failure['count']
+            issue_data['examples'] = failure['examples'][:5]  # Limit examples
+            if 'template_count' in failure:
+                # Instances in the site's shared template; their examples are in template_issues
+                issue_data['template_count'] = failure['template_count']
             detailed_issues.append(issue_data)
-            critical_count += 1
-        
-        # Analyze heading structure
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        heading_issues = []
-        
-        if not headings:
-            heading_issues.append("No headings found on page")
-        else:
-            h1_count = len(soup.find_all('h1'))
-            if h1_count == 0:
-                heading_issues.append("Missing H1 heading")
-            elif h1_count > 1:
-                heading_issues.append(f"Multiple H1 headings found ({h1_count})")
-        
-        if heading_issues:
-            issue_data = self.wcag_guidelines['improper_heading_structure'].copy()
-            issue_data['examples'] = heading_issues
-            detailed_issues.append(issue_data)
-            warning_count += 1
-        
-        # Check for skip links
-        skip_links = soup.find_all('a', href=re.compile(r'^#'))
-        skip_link_texts = [link.get_text().lower() for link in skip_links]
-        has_skip_link = any('skip' in text and ('content' in text or 'main' in text) 
-                          for text in skip_link_texts)
-        
-        if not has_skip_link:
-            issue_data = self.wcag_guidelines['missing_skip_links'].copy()
-            detailed_issues.append(issue_data)
-            warning_count += 1
-        
-        # Check language attribute
-        html_tag = soup.find('html')
-        if not html_tag or not html_tag.get('lang'):
-            issue_data = self.wcag_guidelines['missing_lang_attribute'].copy()
-            detailed_issues.append(issue_data)
-            warning_count += 1
-        
-        # Simulate color contrast issues (in real implementation, this would analyze CSS)
-        if len(soup.find_all(string=True)) > 50:  # If page has substantial content
-            issue_data = self.wcag_guidelines['poor_color_contrast'].copy()
-            issue_data['examples'] = ['Text elements may have insufficient contrast - manual review recommended']
-            detailed_issues.append(issue_data)
-            critical_count += 1
-        
-        # Focus indicators check (simulated)
-        interactive_elements = soup.find_all(['a', 'button', 'input', 'select', 'textarea'])
-        if len(interactive_elements) > 5:  # If page has many interactive elements
-            issue_data = self.wcag_guidelines['inaccessible_focus_indicators'].copy()
-            detailed_issues.append(issue_data)
-            warning_count += 1
+            if failure['severity'] == 'critical':
+                critical_count += 1
+            else:
+                warning_count += 1
         
         # Calculate scores
         total_issues = critical_count + warning_count
@@ -404,10 +600,31 @@ class AccessibilityAnalyzer:
             'analysis_type': 'full'
         }
 
-# Initialize analyzer
-analyzer = AccessibilityAnalyzer()
+# Initialize analyzer; SCAN_COALESCE_DIR enables coalescing across worker processes,
+# SCAN_STORE_PATH overrides where snapshots and scan results are kept
+analyzer = AccessibilityAnalyzer(
+    coalescer=RequestCoalescer(lock_dir=os.environ.get('SCAN_COALESCE_DIR')),
+    store=ScanStore()
+)
+
+MAX_SITE_PAGES = 50
+
+MAX_ISSUE_PAGE_SIZE = 1000
+
+def _run_scan(url, business_type, analysis_type, portfolio_id=None):
+    # Admins can profile a single scan; everyone else takes the unprofiled path
+    mode = profiling.requested_mode(request.headers, request.args)
+    if not mode:
+        return analyzer.analyze_website(url, business_type, analysis_type, portfolio_id=portfolio_id)
+    
+    with profiling.profiled(mode) as profile:
+        result = analyzer.analyze_website(url, business_type, analysis_type, scan_id=profile.scan_id,
+                                          portfolio_id=portfolio_id)
+    result['profile'] = profile.summary()
+    return result
 
 @compliance_bp.route('/api/quick-scan', methods=['POST'])
+@admitted('quick')
 def quick_scan():
     try:
         data = request.get_json()
@@ -421,17 +638,22 @@ def quick_scan():
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        result = analyzer.analyze_website(url, business_type, 'quick')
+        result = _run_scan(url, business_type, 'quick', data.get('portfolio_id'))
         
         if 'error' in result:
             return jsonify(result), 400
         
         return jsonify(result)
         
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except profiling.ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 @compliance_bp.route('/api/full-analysis', methods=['POST'])
+@admitted('full')
 def full_analysis():
     try:
         data = request.get_json()
@@ -445,16 +667,143 @@ def full_analysis():
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        result = analyzer.analyze_website(url, business_type, 'full')
+        result = _run_scan(url, business_type, 'full', data.get('portfolio_id'))
         
         if 'error' in result:
             return jsonify(result), 400
         
         return jsonify(result)
         
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except profiling.ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@compliance_bp.route('/api/site-analysis', methods=['POST'])
+@admitted('batch')
+def site_analysis():
+    try:
+        data = request.get_json()
+        urls = data.get('urls') or []
+        business_type = data.get('business_type', 'default')
+        analysis_type = data.get('type', 'quick')
+        
+        if not urls:
+            return jsonify({'error': 'At least one URL is required'}), 400
+        if len(urls) > MAX_SITE_PAGES:
+            return jsonify({'error': f'At most {MAX_SITE_PAGES} pages can be analyzed at once'}), 400
+        
+        # Add protocol if missing
+        urls = [url if url.startswith(('http://', 'https://')) else 'https://' + url for url in urls]
+        
+        return jsonify(analyzer.analyze_site(urls, business_type, analysis_type))
+        
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@compliance_bp.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'coalescing': analyzer.coalescer.stats(),
+        'hosts': host_health.stats(),
+        'admission': admission.stats(),
+        'rules': rules.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@compliance_bp.route('/api/scans/<scan_id>/issues/<issue_type>', methods=['GET'])
+def scan_issue_elements(scan_id, issue_type):
+    if issue_type not in FULL_RULES:
+        return jsonify({'error': f'Unknown issue type: {issue_type}'}), 404
+    if not analyzer.store.has_scan(scan_id):
+        return jsonify({'error': 'Scan not found'}), 404
+    
+    try:
+        after = int(request.args.get('cursor') or 0)
+        limit = max(1, min(int(request.args.get('limit', 100)), MAX_ISSUE_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'cursor and limit must be integers'}), 400
+    
+    rows = analyzer.store.iter_scan_elements(
+        scan_id, issue_type, after=after,
+        path=request.args.get('path'), contains=request.args.get('contains')
+    )
+    fields = ('path', 'line', 'column', 'snippet')
+    
+    if request.args.get('format') == 'ndjson':
+        # Whole export, streamed straight from the store row by row
+        def stream():
+            for row in rows:
+                yield json.dumps(dict(zip(fields, row[1:]))) + '\n'
+        return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+    
+    page = list(islice(rows, limit + 1))
+    rows.close()
+    has_more = len(page) > limit
+    page = page[:limit]
+    return jsonify({
+        'scan_id': scan_id,
+        'issue_type': issue_type,
+        'elements': [dict(zip(fields, row[1:])) for row in page],
+        'next_cursor': str(page[-1][0]) if has_more else None
+    })
+
+def _dashboard(portfolio_id):
+    period = request.args.get('period', 'week')
+    analysis_type = request.args.get('type', 'quick')
+    if period not in PERIODS:
+        return jsonify({'error': f"period must be one of {', '.join(PERIODS)}"}), 400
+    
+    try:
+        dashboard = analyzer.store.dashboard(
+            portfolio_id,
+            analysis_type=analysis_type,
+            period=period,
+            period_start=request.args.get('start'),
+            business_type=request.args.get('business_type')
+        )
+    except ValueError:
+        return jsonify({'error': 'start must be a date (YYYY-MM-DD)'}), 400
+    
+    if dashboard is None:
+        return jsonify({'error': 'No scans recorded for this portfolio'}), 404
+    
+    return jsonify(dashboard)
+
+@compliance_bp.route('/api/portfolios/<portfolio_id>/dashboard', methods=['GET'])
+def portfolio_dashboard(portfolio_id):
+    return _dashboard(portfolio_id)
+
+@compliance_bp.route('/api/industry/dashboard', methods=['GET'])
+def industry_dashboard():
+    # Every recorded scan, whatever its portfolio; use business_type to pick an industry
+    return _dashboard(ALL_SITES)
+
+@compliance_bp.route('/api/profiles/<scan_id>', methods=['GET'])
+def get_profile(scan_id):
+    if not profiling.is_admin(request.headers, request.args):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    summary = profiling.load_summary(scan_id)
+    if summary is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    return jsonify(summary)
+
+@compliance_bp.route('/api/profiles/<scan_id>/artifact', methods=['GET'])
+def get_profile_artifact(scan_id):
+    if not profiling.is_admin(request.headers, request.args):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    artifact = profiling.artifact_path(scan_id)
+    if artifact is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    path, mimetype = artifact
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=os.path.basename(path))
+
 @compliance_bp.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
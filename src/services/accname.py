@@ -0,0 +1,164 @@
+from bs4 import Comment, NavigableString, Tag
+
+# Not rendered, so never part of a name computed from content
+SKIPPED_TAGS = frozenset(['script', 'style', 'template', 'noscript', 'head'])
+
+# Roles/elements whose accessible name may come from their content
+NAME_FROM_CONTENT = frozenset(['a', 'button', 'label', 'summary', 'legend', 'caption', 'figcaption',
+                               'td', 'th', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'span', 'div', 'p'])
+
+FORM_CONTROLS = frozenset(['input', 'select', 'textarea'])
+
+BUTTON_INPUT_DEFAULTS = {'submit': 'Submit', 'reset': 'Reset'}
+
+
+def _clean(text):
+    return ' '.join(text.split())
+
+
+def _is_hidden(element):
+    if element.get('hidden') is not None or element.get('aria-hidden') == 'true':
+        return True
+    style = (element.get('style') or '').replace(' ', '').lower()
+    return 'display:none' in style or 'visibility:hidden' in style
+
+
+def _named(element):
+    # Contributes its accessible name to its parent's text, rather than its content
+    return bool(element.get('aria-label') or element.get('aria-labelledby')) or element.name in ('img', 'area', 'input')
+
+
+class AccessibleNames:
+    """Accessible names for one document, following a simplified accname 1.2 algorithm.
+
+    Order of precedence: aria-labelledby (ids that resolve), aria-label, the native
+    source (label elements for form controls, alt for images, value for buttons,
+    content for links and buttons), then title. Placeholder is deliberately not
+    treated as a label.
+
+    The id index and label[for] index are built in one pass over the document, and
+    every computed name and content string is memoized, so shared aria-labelledby
+    targets and nested text are only walked once.
+    """
+
+    def __init__(self, soup):
+        self.by_id = {}
+        self.labels_for = {}
+        for element in soup.find_all(True):
+            element_id = element.get('id')
+            if element_id and element_id not in self.by_id:
+                self.by_id[element_id] = element
+            if element.name == 'label' and element.get('for'):
+                self.labels_for.setdefault(element['for'], []).append(element)
+        self._names = {}
+        self._content = {}
+
+    def dangling_labelledby(self, element):
+        """aria-labelledby ids on element that don't exist in the document."""
+        return [ref for ref in (element.get('aria-labelledby') or '').split() if ref not in self.by_id]
+
+    def name(self, element):
+        key = id(element)
+        if key not in self._names:
+            self._names[key] = None  # guards against reference cycles
+            self._names[key] = self._compute(element, follow_labelledby=True)
+        return self._names[key] or ''
+
+    def _compute(self, element, follow_labelledby):
+        if follow_labelledby:
+            refs = [self.by_id[ref] for ref in (element.get('aria-labelledby') or '').split() if ref in self.by_id]
+            if refs:
+                # Referenced nodes contribute even when hidden, but their own labelledby is not followed
+                text = _clean(' '.join(self._compute(ref, follow_labelledby=False) for ref in refs))
+                if text:
+                    return text
+
+        aria_label = _clean(element.get('aria-label') or '')
+        if aria_label:
+            return aria_label
+
+        native = self._native(element)
+        if native:
+            return native
+
+        title = _clean(element.get('title') or '')
+        if title or follow_labelledby:
+            return title
+        # Anything referenced by aria-labelledby is named by its text content
+        return self.content(element)
+
+    def _native(self, element):
+        name = element.name
+        if name == 'img' or name == 'area':
+            return _clean(element.get('alt') or '')
+        if name == 'input':
+            input_type = (element.get('type') or 'text').lower()
+            if input_type == 'image':
+                return _clean(element.get('alt') or element.get('value') or '')
+            if input_type in ('button', 'submit', 'reset'):
+                return _clean(element.get('value') or BUTTON_INPUT_DEFAULTS.get(input_type, ''))
+        if name in FORM_CONTROLS:
+            labels = list(self.labels_for.get(element.get('id'), [])) if element.get('id') else []
+            wrapping = element.find_parent('label')
+            if wrapping is not None and all(wrapping is not label for label in labels):
+                labels.append(wrapping)
+            return _clean(' '.join(self._label_text(label, element) for label in labels))
+        if name in NAME_FROM_CONTENT or element.get('role') in ('button', 'link', 'menuitem', 'tab'):
+            return self.content(element)
+        return ''
+
+    def _label_text(self, label, control):
+        # A label's text, leaving out the control it wraps
+        parts = []
+        for child in label.children:
+            if child is control:
+                continue
+            parts.append(self._node_text(child))
+        return _clean(' '.join(parts))
+
+    def content(self, element):
+        """Text an element contributes from its subtree (memoized).
+
+        Computed bottom-up with an explicit stack, so the deep nesting html.parser builds
+        from unclosed inline tags doesn't hit the recursion limit.
+        """
+        key = id(element)
+        cached = self._content.get(key)
+        if cached is not None:
+            return cached
+        # Each entry's parts are filled in when it is first popped: strings, and the child
+        # tags whose memoized content gets joined in once they have been computed
+        stack = [(element, None)]
+        while stack:
+            node, parts = stack.pop()
+            if parts is None:
+                parts = []
+                stack.append((node, parts))
+                for child in node.children:
+                    if isinstance(child, Comment):
+                        continue
+                    if isinstance(child, NavigableString):
+                        parts.append(str(child))
+                    elif not isinstance(child, Tag) or child.name in SKIPPED_TAGS or _is_hidden(child):
+                        continue
+                    elif _named(child):
+                        parts.append(self.name(child))
+                    else:
+                        parts.append(child)
+                        if id(child) not in self._content:
+                            stack.append((child, None))
+                continue
+            self._content[id(node)] = _clean(' '.join(
+                part if isinstance(part, str) else self._content[id(part)] for part in parts))
+        return self._content[key]
+
+    def _node_text(self, node):
+        if isinstance(node, Comment):
+            return ''
+        if isinstance(node, NavigableString):
+            return str(node)
+        if not isinstance(node, Tag) or node.name in SKIPPED_TAGS or _is_hidden(node):
+            return ''
+        if _named(node):
+            return self.name(node)
+        return self.content(node)
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import jsonify
+
+
+class LaneFull(Exception):
+    """Raised when a request is shed instead of queued."""
+
+    def __init__(self, lane):
+        self.lane = lane
+        super().__init__(f'{lane} lane is at capacity')
+
+
+class _Lane:
+    def __init__(self, name, priority, max_lag, initial_limit, min_limit, max_limit,
+                 max_queue, queue_timeout):
+        self.name = name
+        self.priority = priority
+        self.max_lag = max_lag
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.last_decrease = 0.0
+        self.hold_until = 0.0
+        self.latencies = deque(maxlen=200)
+        self.condition = threading.Condition()
+
+    def has_capacity(self):
+        return self.in_flight < max(1, int(self.limit))
+
+
+class _LagMonitor:
+    """Measures how late a sleeping thread wakes up, smoothed over recent samples.
+
+    Wakeups slip when every core is busy or when CPU-bound requests hold the GIL, so
+    lag tracks this process's saturation. Time spent waiting on scanned sites doesn't
+    add to it. Sampling starts with the first admitted request.
+    """
+
+    def __init__(self, interval=0.02, smoothing=0.2):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.lag = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='admission-lag', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            time.sleep(self.interval)
+            late = max(0.0, time.monotonic() - started - self.interval)
+            self.lag += self.smoothing * (late - self.lag)
+
+
+class AdmissionController:
+    """Priority lanes with AIMD concurrency limits for scan endpoints.
+
+    Each lane admits up to its current limit concurrently and queues a bounded number
+    of further requests for at most queue_timeout seconds; anything beyond that is shed
+    immediately so callers get a fast 503 instead of a slow timeout.
+
+    Limits follow the process's wakeup lag (_LagMonitor) rather than request latency,
+    which is mostly the download of the scanned site and says little about this server.
+    A request completing while lag is within its lane's max_lag raises the limit by
+    1/limit (about +1 per round of requests). Above it, the completion counts as
+    overload and cuts a limit by decrease_factor, at most once per decrease_interval,
+    then holds it for hold_after_decrease seconds. Lower-priority lanes are cut before
+    the completing one, so expensive work backs off first when the cheap,
+    latency-sensitive lanes, which tolerate the least lag, start to suffer.
+    """
+
+    def __init__(self, decrease_factor=0.7, decrease_interval=1.0, hold_after_decrease=5.0, monitor=None):
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.hold_after_decrease = hold_after_decrease
+        self.monitor = monitor or _LagMonitor()
+        self._lanes = {}
+
+    def add_lane(self, name, priority, max_lag, initial_limit=8, min_limit=1, max_limit=64,
+                 max_queue=16, queue_timeout=2.0):
+        self._lanes[name] = _Lane(name, priority, max_lag, initial_limit, min_limit, max_limit,
+                                  max_queue, queue_timeout)
+
+    @contextmanager
+    def admit(self, name):
+        lane = self._lanes[name]
+        self.monitor.start()
+        with lane.condition:
+            if not lane.has_capacity():
+                if lane.queued >= lane.max_queue:
+                    lane.shed += 1
+                    raise LaneFull(name)
+                lane.queued += 1
+                try:
+                    admitted = lane.condition.wait_for(lane.has_capacity, timeout=lane.queue_timeout)
+                finally:
+                    lane.queued -= 1
+                if not admitted:
+                    lane.shed += 1
+                    raise LaneFull(name)
+            lane.in_flight += 1
+            lane.admitted += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with lane.condition:
+                lane.in_flight -= 1
+                lane.latencies.append(time.monotonic() - started)
+                lane.condition.notify()
+            self._adjust(lane, self.monitor.lag)
+
+    def _adjust(self, lane, lag):
+        if lag <= lane.max_lag:
+            with lane.condition:
+                if time.monotonic() < lane.hold_until:
+                    return
+                grew = int(lane.limit)
+                lane.limit = min(lane.max_limit, lane.limit + 1.0 / lane.limit)
+                if int(lane.limit) > grew:
+                    lane.condition.notify()
+            return
+
+        # Overloaded: back off lower-priority lanes first, and only throttle this lane once
+        # they have nothing left to give
+        lower = [other for other in self._lanes.values()
+                 if other.priority > lane.priority and other.limit > other.min_limit]
+        now = time.monotonic()
+        for other in lower or [lane]:
+            with other.condition:
+                if now - other.last_decrease >= self.decrease_interval:
+                    other.limit = max(other.min_limit, other.limit * self.decrease_factor)
+                    other.last_decrease = now
+                    other.hold_until = now + self.hold_after_decrease
+
+    def stats(self):
+        lanes = {}
+        for name, lane in self._lanes.items():
+            with lane.condition:
+                ordered = sorted(lane.latencies)
+                lanes[name] = {
+                    'limit': round(lane.limit, 2),
+                    'in_flight': lane.in_flight,
+                    'queued': lane.queued,
+                    'admitted': lane.admitted,
+                    'shed': lane.shed,
+                    'p99_ms': round(ordered[int(len(ordered) * 0.99)] * 1000) if ordered else None
+                }
+        return {'lag_ms': round(self.monitor.lag * 1000, 1), 'lanes': lanes}
+
+
+def admitted(lane):
+    """Route decorator: run the view inside a lane, answering 503 when the lane sheds.
+
+    lane may be a lane name or a callable picking one from the current request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            name = lane() if callable(lane) else lane
+            try:
+                with admission.admit(name):
+                    return view(*args, **kwargs)
+            except LaneFull:
+                return jsonify({'error': 'Server is busy. Please try again shortly.'}), 503, {'Retry-After': '1'}
+        return wrapper
+    return decorator
+
+
+def _max_lag(lane, default):
+    return float(os.environ.get(f'ADMISSION_{lane.upper()}_MAX_LAG', default))
+
+
+# Lower priority number = more important. Quick scans drive landing-page conversions.
+# Max lags are in seconds: one CPU-bound request already delays wakeups by about the
+# 5ms GIL switch interval, and each further one adds roughly as much again. Quick scans
+# are mostly download time, so the lag left by the full scan that is always admitted
+# mustn't throttle them below a few at once.
+admission = AdmissionController()
+admission.add_lane('quick', priority=0, max_lag=_max_lag('quick', 0.008), initial_limit=16, min_limit=4,
+                   max_limit=64, max_queue=64)
+admission.add_lane('full', priority=1, max_lag=_max_lag('full', 0.015), initial_limit=4, max_limit=16, max_queue=8)
+admission.add_lane('batch', priority=2, max_lag=_max_lag('batch', 0.05), initial_limit=2, max_limit=4, max_queue=2,
+                   queue_timeout=1.0)
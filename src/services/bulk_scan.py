@@ -0,0 +1,360 @@
+import csv
+import gzip
+import json
+import mmap
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+HTML_EXTENSIONS = ('.html', '.htm', '.xhtml')
+
+# .warc.gz files are scanned in ranges of this many compressed bytes, one range per task
+GZIP_RANGE = 1024 * 1024
+GZIP_CHUNK = 64 * 1024
+GZIP_MAGIC = b'\x1f\x8b\x08'
+
+CSV_COLUMNS = [
+    'source', 'url', 'grade', 'compliance_score', 'total_issues',
+    'critical_issues', 'warning_issues', 'risk_level', 'error'
+]
+
+# Per-process state, populated by _init_worker
+_worker = {}
+
+
+class ArchivedHTTPError(Exception):
+    """Raised for an archived 4xx/5xx response, which isn't graded as a page."""
+
+    def __init__(self, status, reason=''):
+        self.status = status
+        super().__init__(f'{status} {reason}'.strip())
+
+
+def iter_tasks(paths, base_url=None):
+    """Yield lightweight scan tasks for every HTML file or WARC response under paths."""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _iter_directory(path, base_url)
+        elif path.endswith('.warc.gz'):
+            yield from _iter_warc_gz(path)
+        elif path.endswith('.warc'):
+            yield from _iter_warc(path)
+        elif path.lower().endswith(HTML_EXTENSIONS):
+            yield ('file', os.path.abspath(path), _file_url(path, os.path.dirname(path), base_url))
+
+
+def _iter_directory(root, base_url):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(HTML_EXTENSIONS):
+                path = os.path.join(dirpath, name)
+                yield ('file', os.path.abspath(path), _file_url(path, root, base_url))
+            elif name.endswith(('.warc', '.warc.gz')):
+                yield from iter_tasks([os.path.join(dirpath, name)])
+
+
+def _file_url(path, root, base_url):
+    if base_url:
+        rel = os.path.relpath(path, root).replace(os.sep, '/')
+        return base_url.rstrip('/') + '/' + rel
+    return 'file://' + os.path.abspath(path)
+
+
+def _parse_warc_headers(block):
+    headers = {}
+    for line in block.split(b'\r\n')[1:]:
+        name, sep, value = line.partition(b':')
+        if sep:
+            headers[name.strip().lower().decode('latin-1')] = value.strip().decode('latin-1')
+    return headers
+
+
+def _iter_records(data):
+    # (headers, payload offset, payload length) of each WARC record in data (bytes or mmap)
+    pos = data.find(b'WARC/')
+    while pos != -1:
+        header_end = data.find(b'\r\n\r\n', pos)
+        if header_end == -1:
+            break
+        headers = _parse_warc_headers(data[pos:header_end])
+        start = header_end + 4
+        length = int(headers.get('content-length', 0))
+        yield headers, start, length
+        pos = data.find(b'WARC/', start + length)
+
+
+def _iter_warc(path):
+    # Only offsets leave the parent; workers map the file and read the payload themselves
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            for headers, start, length in _iter_records(m):
+                if _is_response_record(headers):
+                    yield ('warc', os.path.abspath(path), start, length, headers.get('warc-target-uri', path))
+
+
+def _iter_warc_gz(path):
+    # WARC writers gzip each record as its own member, so the file is handed out in byte
+    # ranges and each worker inflates the members that start in its range. A file that
+    # is one gzip stream can't be split that way and is streamed here instead.
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as view:
+        first = _inflate_member(view, 0)
+    if first is None or len(list(_iter_records(first[0]))) > 1:
+        yield from _stream_warc_gz(path)
+        return
+    for start in range(0, size, GZIP_RANGE):
+        yield ('warc.gz', os.path.abspath(path), start, min(size, start + GZIP_RANGE), f'{path}@{start}')
+
+
+def _stream_warc_gz(path):
+    with gzip.open(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if not line.startswith(b'WARC/'):
+                continue
+            block = [line.rstrip(b'\r\n')]
+            while True:
+                line = f.readline()
+                if not line or line in (b'\r\n', b'\n'):
+                    break
+                block.append(line.rstrip(b'\r\n'))
+            headers = _parse_warc_headers(b'\r\n'.join(block))
+            payload = f.read(int(headers.get('content-length', 0)))
+            if _is_response_record(headers):
+                yield ('bytes', payload, headers.get('warc-target-uri', path))
+
+
+def _inflate_member(view, offset):
+    """Return (WARC data, end offset) of the gzip member at offset, or None if there isn't one there."""
+    inflater = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    chunks = []
+    head = b''
+    pos = offset
+    try:
+        while not inflater.eof and pos < len(view):
+            chunks.append(inflater.decompress(view[pos:pos + GZIP_CHUNK]))
+            pos += GZIP_CHUNK
+            # A gzip signature inside compressed data rarely inflates, let alone to a WARC record
+            if len(head) < 5:
+                head = (head + chunks[-1])[:5]
+                if len(head) == 5 and head != b'WARC/':
+                    return None
+    except zlib.error:
+        return None
+    if not inflater.eof or head != b'WARC/':
+        return None
+    return b''.join(chunks), min(pos, len(view)) - len(inflater.unused_data)
+
+
+def _iter_gzip_range(view, start, end):
+    # (offset, WARC data) of every member starting in [start, end). Members follow one
+    # another, so once one is found the rest are chained; data that breaks the chain is
+    # reported as (offset, None) and the scan looks for the next member after it.
+    def next_signature(pos):
+        pos = view.obj.find(GZIP_MAGIC, pos, end + len(GZIP_MAGIC) - 1)
+        return pos if pos < end else -1
+
+    pos = next_signature(start)
+    chained = False
+    while pos != -1 and pos < end:
+        member = _inflate_member(view, pos)
+        if member is None:
+            if chained:
+                yield pos, None
+                chained = False
+            pos = next_signature(pos + 1)
+            continue
+        chained = True
+        yield pos, member[0]
+        pos = member[1]
+
+
+def _is_response_record(headers):
+    return (headers.get('warc-type') == 'response'
+            and 'application/http' in headers.get('content-type', 'application/http'))
+
+
+def _dechunk(body):
+    out = bytearray()
+    pos = 0
+    while pos < len(body):
+        line_end = body.find(b'\r\n', pos)
+        if line_end == -1:
+            break
+        size = int(body[pos:line_end].split(b';')[0] or b'0', 16)
+        if size == 0:
+            break
+        out += body[line_end + 2:line_end + 2 + size]
+        pos = line_end + 2 + size + 2
+    return bytes(out)
+
+
+def decode_http_payload(raw):
+    """Return the HTML body of an archived HTTP response, or None if it isn't an HTML page.
+
+    Only 2xx responses are pages. Redirects and other 1xx/3xx responses return None (a
+    redirect's target is archived as a record of its own); 4xx/5xx responses raise
+    ArchivedHTTPError, as raise_for_status() does for a live fetch.
+    """
+    head, sep, body = bytes(raw).partition(b'\r\n\r\n')
+    if not sep:
+        return None
+    status_line = head.split(b'\r\n', 1)[0].split()
+    if len(status_line) < 2 or not status_line[0].startswith(b'HTTP/') or not status_line[1].isdigit():
+        return None
+    status = int(status_line[1])
+    if status >= 400:
+        raise ArchivedHTTPError(status, b' '.join(status_line[2:]).decode('latin-1'))
+    if not 200 <= status < 300:
+        return None
+    headers = _parse_warc_headers(head)
+    if 'html' not in headers.get('content-type', 'text/html').lower():
+        return None
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = _dechunk(body)
+    encoding = headers.get('content-encoding', '').lower()
+    if encoding in ('gzip', 'x-gzip'):
+        body = gzip.decompress(body)
+    elif encoding == 'deflate':
+        body = zlib.decompress(body)
+    return body
+
+
+def _init_worker(analysis_type, business_type):
+    from routes.compliance import AccessibilityAnalyzer
+
+    _worker['analyzer'] = AccessibilityAnalyzer()
+    _worker['analysis_type'] = analysis_type
+    _worker['business_type'] = business_type
+    _worker['maps'] = {}
+
+
+def _mapped(path):
+    maps = _worker['maps']
+    if path not in maps:
+        with open(path, 'rb') as f:
+            maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return maps[path]
+
+
+def _scan_task(task):
+    """Scan one task and return its rows: a .warc.gz range holds many pages, other tasks at most one."""
+    kind = task[0]
+    url = task[-1]
+    if kind == 'warc.gz':
+        return _scan_gzip_range(*task[1:4])
+    if kind == 'file':
+        row = _scan_page(task[1], url, partial(_read_file, task[1]))
+    elif kind == 'warc':
+        path, start, length = task[1:4]
+        row = _scan_page(f'{path}@{start}', url, lambda: decode_http_payload(_mapped(path)[start:start + length]))
+    else:
+        row = _scan_page(url, url, partial(decode_http_payload, task[1]))
+    return [row] if row is not None else []
+
+
+def _read_file(path):
+    if os.path.getsize(path) == 0:
+        return b''
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return m[:]
+
+
+def _scan_gzip_range(path, start, end):
+    rows = []
+    with memoryview(_mapped(path)) as view:
+        for offset, data in _iter_gzip_range(view, start, end):
+            source = f'{path}@{offset}'
+            if data is None:
+                rows.append({'source': source, 'url': source, 'error': 'Read error: corrupt gzip member'})
+                continue
+            for headers, payload_start, length in _iter_records(data):
+                if _is_response_record(headers):
+                    payload = data[payload_start:payload_start + length]
+                    row = _scan_page(source, headers.get('warc-target-uri', path), partial(decode_http_payload, payload))
+                    if row is not None:
+                        rows.append(row)
+    return rows
+
+
+def _scan_page(source, url, read):
+    try:
+        html = read()
+    except ArchivedHTTPError as e:
+        return {'source': source, 'url': url, 'error': f'Archived response: HTTP {e}'}
+    except Exception as e:
+        return {'source': url, 'url': url, 'error': f'Read error: {str(e)}'}
+
+    if html is None:
+        return None
+
+    result = _worker['analyzer'].analyze_html(url, html, _worker['business_type'], _worker['analysis_type'])
+    return {'source': source, **result}
+
+
+class _Writer:
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(stream, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row) + '\n')
+
+
+def run_bulk_scan(paths, output=None, fmt='jsonl', analysis_type='quick', business_type='default',
+                  workers=None, base_url=None):
+    """Scan local HTML/WARC sources across a process pool and write one row per page."""
+    workers = workers or os.cpu_count() or 1
+    stream = output or sys.stdout
+    writer = _Writer(stream, fmt)
+    max_in_flight = workers * 4
+    pages = 0
+    errors = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(analysis_type, business_type)) as pool:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pages, errors, pending
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                for row in future.result():
+                    pages += 1
+                    if 'error' in row:
+                        errors += 1
+                    writer.write(row)
+
+        for task in iter_tasks(paths, base_url):
+            pending.add(pool.submit(_scan_task, task))
+            # Bound in-flight work so huge archives stream instead of queueing in memory
+            if len(pending) >= max_in_flight:
+                drain(FIRST_COMPLETED)
+        if pending:
+            drain(ALL_COMPLETED)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'pages': pages,
+        'errors': errors,
+        'workers': workers,
+        'elapsed_seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed > 0 else 0.0
+    }
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """Canonical form used as the coalescing key: same page, same key."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Single-flight fetch+parse: concurrent requests for one URL share a single download.
+
+    With lock_dir set, processes on the same host also coordinate through a table of
+    lock files; a process that waited on another reuses the body it just fetched
+    (within share_window seconds) and only parses it locally. Every sweep_interval
+    seconds a leader deletes bodies past share_window together with their lock files,
+    so the directory only holds recently fetched URLs.
+    """
+
+    def __init__(self, lock_dir=None, share_window=5.0, sweep_interval=30.0):
+        self.lock_dir = lock_dir
+        self.share_window = share_window
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {
+            'requests': 0,
+            'fetches': 0,
+            'coalesced_in_process': 0,
+            'coalesced_cross_process': 0
+        }
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def get(self, url, fetch, parse, namespace=None):
+        """parse(fetch(url)), shared with concurrent calls for the same URL and namespace.
+
+        Callers whose parse() results differ (pages and frames) pass different namespaces.
+        """
+        key = normalize_url(url)
+        if namespace:
+            key = f'{namespace} {key}'
+        with self._lock:
+            self._stats['requests'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats['coalesced_in_process'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_dir:
+                content = self._fetch_shared(key, url, fetch)
+            else:
+                content = self._fetch(url, fetch)
+            call.result = parse(content)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def _fetch(self, url, fetch):
+        with self._lock:
+            self._stats['fetches'] += 1
+        return fetch(url)
+
+    def _fetch_shared(self, key, url, fetch):
+        import fcntl
+
+        self._maybe_sweep()
+        base = os.path.join(self.lock_dir, hashlib.sha1(key.encode()).hexdigest())
+        body_path = base + '.body'
+        with self._locked(base + '.lock') as lock_file:
+            try:
+                try:
+                    if time.time() - os.path.getmtime(body_path) < self.share_window:
+                        with open(body_path, 'rb') as f:
+                            content = f.read()
+                        with self._lock:
+                            self._stats['coalesced_cross_process'] += 1
+                        return content
+                except OSError:
+                    pass
+
+                content = self._fetch(url, fetch)
+                tmp_path = f'{body_path}.{os.getpid()}'
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, body_path)
+                return content
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked(self, lock_path):
+        import fcntl
+
+        while True:
+            lock_file = open(lock_path, 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                current = os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                break
+            # Swept while we waited for it; lock whatever file now has that name
+            lock_file.close()
+        with lock_file:
+            yield lock_file
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        self._sweep()
+
+    def _sweep(self):
+        """Delete lock files, bodies and leftover temp files not written to within share_window."""
+        import fcntl
+
+        cutoff = time.time() - self.share_window
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if not entry.name.endswith('.lock'):
+                    # Temp files are only written under the lock, so an old one is a crashed writer's
+                    if '.body.' in entry.name:
+                        os.remove(entry.path)
+                    continue
+                body_path = entry.path[:-len('.lock')] + '.body'
+                with open(entry.path, 'a') as lock_file:
+                    # Skip keys someone is fetching right now
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    try:
+                        if os.path.getmtime(body_path) >= cutoff:
+                            continue
+                        os.remove(body_path)
+                    except FileNotFoundError:
+                        pass
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        stats['coalesced'] = stats['coalesced_in_process'] + stats['coalesced_cross_process']
+        return stats
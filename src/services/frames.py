@@ -0,0 +1,138 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+from services.rules import Document
+
+
+def _setting(name, default):
+    return int(os.environ.get(f'SCAN_{name}', default))
+
+
+# Frames scanned per page, by origin relative to the scanned page. Third-party
+# widgets are opt-in: they are slow to fetch and their markup is the vendor's.
+MAX_SAME_ORIGIN_FRAMES = _setting('MAX_SAME_ORIGIN_FRAMES', 5)
+MAX_CROSS_ORIGIN_FRAMES = _setting('MAX_CROSS_ORIGIN_FRAMES', 0)
+# 1 = frames in the page itself, 2 = also frames inside those, ...; 0 disables frame scanning
+MAX_FRAME_DEPTH = _setting('MAX_FRAME_DEPTH', 2)
+# Wall-clock budget for a whole scan, page and frames included
+SCAN_BUDGET = float(os.environ.get('SCAN_BUDGET_SECONDS', 20))
+# Frames aren't started with less time than this left; they would only time out
+MIN_FRAME_TIMEOUT = 1.0
+
+# Shared by every scan, so outbound frame fetches are bounded process-wide
+_pool = ThreadPoolExecutor(max_workers=_setting('FRAME_WORKERS', 16), thread_name_prefix='frame-fetch')
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return parts.scheme, parts.hostname, parts.port or {'http': 80, 'https': 443}.get(parts.scheme)
+
+
+class FrameCollector:
+    """Loads a page's iframe/frame documents in the background while the page itself is analyzed.
+
+    Frames come from iframe/frame src (and iframe srcdoc), are fetched concurrently on
+    a shared bounded pool, and frames nested in a loaded frame are queued as soon as it
+    arrives, down to max_depth. Everything shares one deadline (a time.monotonic()
+    value): load(url, budget) fetches a frame in the time left and returns (html,
+    soup), and frames still loading when it passes are reported as timed out rather
+    than waited for. srcdoc frames go through parse(html), which returns the same.
+
+    Frame elements are picked out of each Document's shared element walk, which the
+    rules reuse, so pages without frames pay next to nothing; doc is the page's own.
+    """
+
+    def __init__(self, url, soup, load, parse, deadline, max_same_origin=None, max_cross_origin=None,
+                 max_depth=None, pool=None):
+        self.load = load
+        self.parse = parse
+        self.deadline = deadline
+        self.max_depth = MAX_FRAME_DEPTH if max_depth is None else max_depth
+        self.limits = {
+            'same': MAX_SAME_ORIGIN_FRAMES if max_same_origin is None else max_same_origin,
+            'cross': MAX_CROSS_ORIGIN_FRAMES if max_cross_origin is None else max_cross_origin
+        }
+        self.pool = pool or _pool
+        self.origin = _origin(url)
+        self.counts = {'same': 0, 'cross': 0}
+        self.skipped = {'cross_origin': 0, 'limit': 0, 'deadline': 0}
+        self.frames = []
+        self._seen = {urldefrag(url)[0]}
+        self._pending = {}
+        self.doc = Document(soup)
+        self._discover(url, self.doc, None, 1)
+
+    def _discover(self, base_url, doc, parent, depth):
+        if depth > self.max_depth:
+            return
+        for element in doc.elements(doc.soup):
+            if element.name != 'iframe' and element.name != 'frame':
+                continue
+            srcdoc = element.get('srcdoc') if element.name == 'iframe' else None
+            if srcdoc is not None:
+                frame_url, origin = 'about:srcdoc', 'same'
+            else:
+                frame_url = urldefrag(urljoin(base_url, (element.get('src') or '').strip()))[0]
+                # Nothing to fetch for about:blank, javascript:, data: and the like
+                if urlsplit(frame_url).scheme not in ('http', 'https') or frame_url in self._seen:
+                    continue
+                self._seen.add(frame_url)
+                origin = 'same' if _origin(frame_url) == self.origin else 'cross'
+
+            if self.counts[origin] >= self.limits[origin]:
+                self.skipped['cross_origin' if origin == 'cross' and not self.limits['cross'] else 'limit'] += 1
+                continue
+            remaining = self.deadline - time.monotonic()
+            if remaining < MIN_FRAME_TIMEOUT:
+                self.skipped['deadline'] += 1
+                continue
+            self.counts[origin] += 1
+            frame = {
+                'url': frame_url,
+                # Nested frames in a srcdoc document resolve against the embedding page
+                'base_url': base_url if srcdoc is not None else frame_url,
+                'depth': depth,
+                'origin': origin,
+                'element': element,
+                'parent': parent,
+                'status': 'loading'
+            }
+            self.frames.append(frame)
+            self._pending[self.pool.submit(self._load, frame_url, srcdoc, remaining)] = frame
+
+    def _load(self, url, srcdoc, budget):
+        return self.parse(srcdoc) if srcdoc is not None else self.load(url, budget)
+
+    def wait(self):
+        """Block until every frame has loaded or the deadline passes; returns the frames in discovery order.
+
+        Each frame dict has url, depth, origin, element (its iframe/frame tag in the
+        parent document), parent (the enclosing frame dict, None at the top) and status:
+        'scanned' with html and doc, 'error' with error, or 'timeout'.
+        """
+        while self._pending:
+            done, _ = wait(self._pending, timeout=max(0, self.deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                frame = self._pending.pop(future)
+                try:
+                    html, soup = future.result()
+                except Exception as e:
+                    frame['status'] = 'error'
+                    frame['error'] = str(e)
+                    continue
+                frame['status'] = 'scanned'
+                frame['html'] = html
+                frame['doc'] = Document(soup)
+                self._discover(frame['base_url'], frame['doc'], frame, frame['depth'] + 1)
+
+        # Out of time: whatever is still queued is dropped, running fetches end on their own timeout
+        for future, frame in self._pending.items():
+            future.cancel()
+            frame['status'] = 'timeout'
+        self._pending.clear()
+        return self.frames
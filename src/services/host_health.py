@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class HostCircuitOpen(requests.exceptions.ConnectionError):
+    """Raised without touching the network while a host's circuit breaker is open."""
+
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f'{host} is failing repeatedly; skipping it for {retry_after:.0f}s')
+
+
+class _Host:
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def percentile(self, pct):
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class HostHealthTracker:
+    """Per-host latency tracking, adaptive timeouts and circuit breaking for outbound fetches.
+
+    Timeouts are derived from the host's observed p95 latency (times timeout_factor),
+    clamped between min_timeout and the caller's timeout, once min_samples requests have
+    completed; the caller's timeout always wins, even below min_timeout. After
+    failure_threshold consecutive timeouts or connection errors the circuit opens and
+    requests fail fast for cooldown seconds; then a single half-open probe decides
+    whether to close it again.
+    """
+
+    def __init__(self, min_timeout=2.0, timeout_factor=4.0, min_samples=5, window=100,
+                 failure_threshold=3, cooldown=30.0, max_hosts=10000):
+        self.min_timeout = min_timeout
+        self.timeout_factor = timeout_factor
+        self.min_samples = min_samples
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_hosts = max_hosts
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        entry = self._hosts.get(host)
+        if entry is None:
+            if len(self._hosts) >= self.max_hosts:
+                # Forget the oldest host rather than growing without bound
+                self._hosts.pop(next(iter(self._hosts)))
+            entry = self._hosts[host] = _Host(self.window)
+        return entry
+
+    def timeout_for(self, host, max_timeout):
+        with self._lock:
+            entry = self._host(host)
+            if len(entry.latencies) < self.min_samples:
+                return max_timeout
+            adaptive = entry.percentile(95) * self.timeout_factor
+        return min(max_timeout, max(self.min_timeout, adaptive))
+
+    def before_request(self, host):
+        """Raise HostCircuitOpen if the host should not be contacted right now."""
+        with self._lock:
+            entry = self._host(host)
+            if entry.state == CLOSED:
+                return
+            remaining = entry.opened_at + self.cooldown - time.monotonic()
+            if entry.state == OPEN and remaining <= 0:
+                entry.state = HALF_OPEN
+            if entry.state == HALF_OPEN and not entry.probing:
+                entry.probing = True
+                return
+            entry.rejected += 1
+        raise HostCircuitOpen(host, max(remaining, 1.0))
+
+    def record_success(self, host, latency):
+        with self._lock:
+            entry = self._host(host)
+            entry.latencies.append(latency)
+            entry.successes += 1
+            entry.consecutive_failures = 0
+            entry.state = CLOSED
+            entry.probing = False
+
+    def record_failure(self, host):
+        with self._lock:
+            entry = self._host(host)
+            entry.failures += 1
+            entry.consecutive_failures += 1
+            if entry.state == HALF_OPEN or entry.consecutive_failures >= self.failure_threshold:
+                entry.state = OPEN
+                entry.opened_at = time.monotonic()
+            entry.probing = False
+
+    def get(self, url, timeout=10, budget=None, **kwargs):
+        """requests.get() guarded by the host's breaker, with timeout as the upper bound.
+
+        budget is the time the caller has left overall. A timeout that only happened
+        because budget was shorter than the host's own timeout isn't held against the host.
+        """
+        host = (urlsplit(url).hostname or '').lower()
+        self.before_request(host)
+        host_timeout = self.timeout_for(host, timeout)
+        effective = host_timeout if budget is None else min(host_timeout, budget)
+        started = time.monotonic()
+        try:
+            response = requests.get(url, timeout=effective, **kwargs)
+        except requests.exceptions.Timeout:
+            if effective < host_timeout:
+                self._release_probe(host)
+            else:
+                self.record_failure(host)
+            raise
+        except requests.exceptions.ConnectionError:
+            self.record_failure(host)
+            raise
+        except Exception:
+            # Not the host's fault (bad URL, too many redirects...); just release a probe slot
+            self._release_probe(host)
+            raise
+        self.record_success(host, time.monotonic() - started)
+        return response
+
+    def _release_probe(self, host):
+        with self._lock:
+            self._host(host).probing = False
+
+    def stats(self):
+        """Summary for /api/metrics; per-host detail only for hosts that have failed."""
+        with self._lock:
+            return {
+                'tracked_hosts': len(self._hosts),
+                'open_circuits': sum(1 for entry in self._hosts.values() if entry.state != CLOSED),
+                'unhealthy_hosts': {
+                    host: {
+                        'state': entry.state,
+                        'consecutive_failures': entry.consecutive_failures,
+                        'p95_ms': round(entry.percentile(95) * 1000) if entry.latencies else None,
+                        'successes': entry.successes,
+                        'failures': entry.failures,
+                        'rejected': entry.rejected
+                    }
+                    for host, entry in self._hosts.items()
+                    if entry.state != CLOSED or entry.consecutive_failures
+                }
+            }
+
+
+# Shared by every fetch path in the process
+host_health = HostHealthTracker()
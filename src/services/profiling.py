@@ -0,0 +1,203 @@
+import cProfile
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+PROFILE_DIR = os.environ.get('SCAN_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'ada-scan-profiles'))
+PROFILE_TOKEN = os.environ.get('SCAN_PROFILE_TOKEN')
+MAX_STORED_PROFILES = 200
+MODES = ('cprofile', 'sample')
+
+_state = threading.local()
+_NULL_SECTION = nullcontext()
+# tracemalloc is process-wide, so only one profiled scan may run at a time
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _token(headers, args):
+    return headers.get('X-Profile-Token') or args.get('profile_token')
+
+
+def is_admin(headers, args):
+    token = _token(headers, args)
+    return bool(token and PROFILE_TOKEN and hmac.compare_digest(token, PROFILE_TOKEN))
+
+
+def requested_mode(headers, args):
+    """Profiling mode asked for by an admin request, None if not requested.
+
+    Raises PermissionError when a profile is requested with a wrong token. Profiling is
+    disabled entirely unless SCAN_PROFILE_TOKEN is configured.
+    """
+    if not _token(headers, args) or not PROFILE_TOKEN:
+        return None
+    if not is_admin(headers, args):
+        raise PermissionError('Invalid profiling token')
+    mode = headers.get('X-Profile-Mode') or args.get('profile_mode') or 'cprofile'
+    return mode if mode in MODES else 'cprofile'
+
+
+def active():
+    return getattr(_state, 'profile', None) is not None
+
+
+def section(name):
+    """Time a named part of a scan; a shared no-op unless this thread is being profiled."""
+    profile = getattr(_state, 'profile', None)
+    if profile is None:
+        return _NULL_SECTION
+    return profile.section(name)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class ScanProfile:
+    def __init__(self, mode, sample_interval=0.002):
+        self.scan_id = uuid.uuid4().hex
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.sections = []
+        self.total_ms = 0.0
+        # Peak seen so far by each open section, innermost last
+        self._open_peaks = []
+
+    @contextmanager
+    def section(self, name):
+        alloc_before, peak = tracemalloc.get_traced_memory()
+        # reset_peak() drops the enclosing section's peak so far, so carry it over by hand
+        if self._open_peaks:
+            self._open_peaks[-1] = max(self._open_peaks[-1], peak)
+        self._open_peaks.append(alloc_before)
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._open_peaks.pop())
+            self.sections.append({
+                'name': name,
+                'wall_ms': round(wall * 1000, 3),
+                'alloc_kb': round((current - alloc_before) / 1024, 1),
+                'peak_kb': round((peak - alloc_before) / 1024, 1)
+            })
+
+    def summary(self):
+        return {
+            'scan_id': self.scan_id,
+            'mode': self.mode,
+            'total_ms': self.total_ms,
+            'sections': self.sections,
+            'artifact': f'/api/profiles/{self.scan_id}/artifact'
+        }
+
+
+@contextmanager
+def profiled(mode):
+    """Run the enclosed scan under cProfile or the stack sampler, then store its artifacts."""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy('Another profiled scan is already running')
+    profile = ScanProfile(mode)
+    profiler = sampler = None
+    try:
+        tracemalloc.start()
+        if mode == 'sample':
+            sampler = _Sampler(threading.get_ident(), profile.sample_interval)
+            sampler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        _state.profile = profile
+        started = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.total_ms = round((time.perf_counter() - started) * 1000, 3)
+            _state.profile = None
+            if profiler:
+                profiler.disable()
+            if sampler:
+                sampler.stopped.set()
+                sampler.join()
+            tracemalloc.stop()
+        _store(profile, profiler, sampler)
+    finally:
+        _profile_lock.release()
+
+
+def _store(profile, profiler, sampler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile.scan_id)
+    if profiler:
+        profiler.dump_stats(base + '.pstats')
+    else:
+        with open(base + '.collapsed', 'w') as f:
+            f.write(sampler.collapsed())
+    with open(base + '.json', 'w') as f:
+        json.dump(profile.summary(), f)
+
+    summaries = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in summaries[:-MAX_STORED_PROFILES]:
+        for suffix in ('.json', '.pstats', '.collapsed'):
+            try:
+                os.remove(entry.path[:-len('.json')] + suffix)
+            except OSError:
+                pass
+
+
+def load_summary(scan_id):
+    try:
+        with open(os.path.join(PROFILE_DIR, f'{uuid.UUID(scan_id).hex}.json')) as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return None
+
+
+def artifact_path(scan_id):
+    """(path, mimetype) of a stored profile artifact, or None."""
+    try:
+        base = os.path.join(PROFILE_DIR, uuid.UUID(scan_id).hex)
+    except ValueError:
+        return None
+    if os.path.exists(base + '.pstats'):
+        return base + '.pstats', 'application/octet-stream'
+    if os.path.exists(base + '.collapsed'):
+        return base + '.collapsed', 'text/plain'
+    return None
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from services.scan_store import ScanStore
+
+# Per-process state, populated by _init_worker
+_worker = {}
+
+
+def _init_worker(store_path):
+    from routes.compliance import AccessibilityAnalyzer
+
+    _worker['store'] = ScanStore(store_path)
+    _worker['analyzer'] = AccessibilityAnalyzer()
+
+
+def _rescore(row):
+    (scan_id, url, snapshot_hash, analysis_type, business_type, ruleset_version, grade, score, portfolio_id,
+     frame_snapshots) = row
+    store = _worker['store']
+    html = store.get_snapshot(snapshot_hash)
+    if html is None:
+        return row, {'error': 'Snapshot missing', 'url': url}, None
+    # Scans from before frames were stored (None) are replayed without frames, as they were graded
+    load_frame = None
+    if frame_snapshots is not None:
+        frame_hashes = json.loads(frame_snapshots)
+
+        def load_frame(frame_url):
+            return store.get_snapshot(frame_hashes[frame_url]) if frame_url in frame_hashes else None
+
+    elements = {}
+    result = _worker['analyzer'].analyze_html(url, html, business_type, analysis_type, elements=elements,
+                                              load_frame=load_frame)
+    return row, result, elements
+
+
+def run_rescore(store_path=None, analysis_type=None, workers=None, record=False, limit=None):
+    """Replay the latest stored snapshot of every URL through the current rules.
+
+    Returns a report of grade transitions and score deltas. With record=True the new
+    results are saved as fresh scans tagged with the current ruleset version and the
+    scan they re-grade; they don't change the dashboard rollups.
+    """
+    store = ScanStore(store_path)
+    # Separate connection so new rows don't show up in the scan being iterated
+    writer = ScanStore(store.path) if record else None
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 8
+    transitions = Counter()
+    rescored = changed = errors = 0
+    score_delta_sum = 0
+    started = time.perf_counter()
+
+    def collect(done):
+        nonlocal rescored, changed, errors, score_delta_sum
+        for future in done:
+            row, result, elements = future.result()
+            if 'error' in result:
+                errors += 1
+                continue
+            rescored += 1
+            old_grade, old_score = row[6], row[7] or 0
+            transitions[f"{old_grade}->{result['grade']}"] += 1
+            if old_grade != result['grade'] or old_score != result['compliance_score']:
+                changed += 1
+            score_delta_sum += result['compliance_score'] - old_score
+            if record:
+                writer.record_scan(result, row[2], row[4], row[8], elements, regraded_from=row[0],
+                                   frame_snapshots=json.loads(row[9]) if row[9] is not None else None)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(store.path,)) as pool:
+        pending = set()
+        for index, row in enumerate(store.iter_latest_scans(analysis_type)):
+            if limit is not None and index >= limit:
+                break
+            pending.add(pool.submit(_rescore, row))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        done, pending = wait(pending, return_when=ALL_COMPLETED)
+        collect(done)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'rescored': rescored,
+        'changed': changed,
+        'errors': errors,
+        'average_score_delta': round(score_delta_sum / rescored, 2) if rescored else 0.0,
+        'grade_transitions': dict(transitions.most_common()),
+        'elapsed_seconds': round(elapsed, 3),
+        'pages_per_sec': round(rescored / elapsed, 2) if elapsed > 0 else 0.0
+    }
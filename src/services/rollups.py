@@ -0,0 +1,273 @@
+import json
+from datetime import date, timedelta
+
+# Pseudo-portfolio every scan also rolls up into, for industry-wide benchmarks
+ALL_SITES = '*'
+
+PERIODS = ('day', 'week')
+
+GRADES = ('A', 'B', 'C', 'D', 'F')
+
+RISK_RANK = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2, 'CRITICAL': 3}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rollup_sites (
+    portfolio_id TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    url TEXT NOT NULL,
+    business_type TEXT NOT NULL,
+    scan_id TEXT NOT NULL,
+    scanned_at TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    grade TEXT NOT NULL,
+    issues TEXT NOT NULL,
+    risk_level TEXT,
+    previous_risk_level TEXT,
+    worsened INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (portfolio_id, analysis_type, period, period_start, url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollup_sites_url ON rollup_sites(portfolio_id, analysis_type, period, url, period_start);
+CREATE INDEX IF NOT EXISTS rollup_sites_worsened
+    ON rollup_sites(portfolio_id, analysis_type, period, period_start, worsened, business_type);
+CREATE TABLE IF NOT EXISTS rollups (
+    portfolio_id TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    business_type TEXT NOT NULL,
+    sites INTEGER NOT NULL,
+    score_sum INTEGER NOT NULL,
+    grade_a INTEGER NOT NULL,
+    grade_b INTEGER NOT NULL,
+    grade_c INTEGER NOT NULL,
+    grade_d INTEGER NOT NULL,
+    grade_f INTEGER NOT NULL,
+    PRIMARY KEY (portfolio_id, analysis_type, period, period_start, business_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_issues (
+    portfolio_id TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    business_type TEXT NOT NULL,
+    issue TEXT NOT NULL,
+    sites INTEGER NOT NULL,
+    PRIMARY KEY (portfolio_id, analysis_type, period, period_start, business_type, issue)
+) WITHOUT ROWID;
+'''
+
+
+def period_starts(scanned_at):
+    """{'day': ..., 'week': ...} ISO dates of the periods a scan timestamp falls in (weeks start Monday)."""
+    day = date.fromisoformat(scanned_at[:10])
+    return {'day': day.isoformat(), 'week': (day - timedelta(days=day.weekday())).isoformat()}
+
+
+def scan_issues(result):
+    """Issue names a scan result reports, as shown on dashboards."""
+    if 'detailed_issues' in result:
+        return [issue['title'] for issue in result['detailed_issues']]
+    return list(result.get('top_issues') or [])
+
+
+def apply_scan(conn, scan):
+    """Fold one scan into the rollups; safe to call any number of times, in any order.
+
+    scan is a dict with scan_id, url, portfolio_id, business_type, analysis_type,
+    scanned_at, score, grade, risk_level and issues. Each site counts once per period,
+    with its latest scan: a newer scan replaces the older one's contribution, and an
+    older or already-applied scan changes nothing. A site's risk in a period is compared
+    with its risk in the last earlier period it was scanned in, so rescans within a
+    period don't reset the comparison. The caller owns the transaction.
+    """
+    portfolios = [ALL_SITES] + ([scan['portfolio_id']] if scan.get('portfolio_id') else [])
+    starts = period_starts(scan['scanned_at'])
+    position = (scan['scanned_at'], scan['scan_id'])
+    for portfolio_id in portfolios:
+        for period in PERIODS:
+            key = (portfolio_id, scan['analysis_type'], period, starts[period])
+            current = conn.execute(
+                'SELECT scanned_at, scan_id, business_type, score, grade, issues FROM rollup_sites '
+                'WHERE portfolio_id = ? AND analysis_type = ? AND period = ? AND period_start = ? AND url = ?',
+                key + (scan['url'],)
+            ).fetchone()
+            if current and (current[0], current[1]) >= position:
+                continue
+            if current:
+                _contribute(conn, key, current[2], current[3], current[4], json.loads(current[5]), -1)
+            _contribute(conn, key, scan['business_type'], scan['score'], scan['grade'], scan['issues'], 1)
+            previous = _adjacent_risk(conn, key, scan['url'], later=False)
+            previous_risk = previous[1] if previous else None
+            conn.execute(
+                'INSERT OR REPLACE INTO rollup_sites (portfolio_id, analysis_type, period, period_start, url, '
+                'business_type, scan_id, scanned_at, score, grade, issues, risk_level, previous_risk_level, worsened) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                key + (scan['url'], scan['business_type'], scan['scan_id'], scan['scanned_at'], scan['score'],
+                       scan['grade'], json.dumps(scan['issues']), scan['risk_level'], previous_risk,
+                       _worsened(previous_risk, scan['risk_level']))
+            )
+            # The next period the site was scanned in compares against this one
+            following = _adjacent_risk(conn, key, scan['url'], later=True)
+            if following:
+                conn.execute(
+                    'UPDATE rollup_sites SET previous_risk_level = ?, worsened = ? WHERE portfolio_id = ? '
+                    'AND analysis_type = ? AND period = ? AND period_start = ? AND url = ?',
+                    (scan['risk_level'], _worsened(scan['risk_level'], following[1])) + key[:3]
+                    + (following[0], scan['url'])
+                )
+
+
+def _contribute(conn, key, business_type, score, grade, issues, sign):
+    grades = [sign if grade == name else 0 for name in GRADES]
+    conn.execute(
+        'INSERT INTO rollups (portfolio_id, analysis_type, period, period_start, business_type, sites, score_sum, '
+        'grade_a, grade_b, grade_c, grade_d, grade_f) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT (portfolio_id, analysis_type, period, period_start, business_type) DO UPDATE SET '
+        'sites = sites + excluded.sites, score_sum = score_sum + excluded.score_sum, '
+        'grade_a = grade_a + excluded.grade_a, grade_b = grade_b + excluded.grade_b, '
+        'grade_c = grade_c + excluded.grade_c, grade_d = grade_d + excluded.grade_d, '
+        'grade_f = grade_f + excluded.grade_f',
+        key + (business_type, sign, sign * (score or 0), *grades)
+    )
+    conn.executemany(
+        'INSERT INTO rollup_issues (portfolio_id, analysis_type, period, period_start, business_type, issue, sites) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT (portfolio_id, analysis_type, period, period_start, business_type, issue) DO UPDATE SET '
+        'sites = sites + excluded.sites',
+        [key + (business_type, issue, sign) for issue in set(issues)]
+    )
+
+
+def _adjacent_risk(conn, key, url, later):
+    # (period_start, risk_level) of the site's nearest scanned period before or after key's.
+    # Left to itself the planner ranges over the primary key, i.e. every site's periods.
+    portfolio_id, analysis_type, period, period_start = key
+    return conn.execute(
+        'SELECT period_start, risk_level FROM rollup_sites INDEXED BY rollup_sites_url '
+        'WHERE portfolio_id = ? AND analysis_type = ? '
+        f"AND period = ? AND url = ? AND period_start {'>' if later else '<'} ? "
+        f"ORDER BY period_start {'ASC' if later else 'DESC'} LIMIT 1",
+        (portfolio_id, analysis_type, period, url, period_start)
+    ).fetchone()
+
+
+def _worsened(previous, current):
+    return int(previous is not None and RISK_RANK.get(current, 0) > RISK_RANK.get(previous, 0))
+
+
+def migrate(conn):
+    """Add per-period risk to rollup_sites in stores created before it was kept there.
+
+    Fills it in from the scans each row counts, links every period to the one before it
+    and drops the site_risk table it replaces. Runs before SCHEMA, whose indexes need
+    the new columns.
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(rollup_sites)')]
+    if not columns or 'risk_level' in columns:
+        return
+    with conn:
+        conn.execute('ALTER TABLE rollup_sites ADD COLUMN risk_level TEXT')
+        conn.execute('ALTER TABLE rollup_sites ADD COLUMN previous_risk_level TEXT')
+        conn.execute('ALTER TABLE rollup_sites ADD COLUMN worsened INTEGER NOT NULL DEFAULT 0')
+        conn.execute('UPDATE rollup_sites SET risk_level = '
+                     '(SELECT risk_level FROM scans WHERE scans.scan_id = rollup_sites.scan_id)')
+        updates = []
+        last = (None, None)
+        for *site, period_start, risk in conn.execute(
+            'SELECT portfolio_id, analysis_type, period, url, period_start, risk_level FROM rollup_sites '
+            'ORDER BY portfolio_id, analysis_type, period, url, period_start'
+        ):
+            previous = last[1] if last[0] == site else None
+            updates.append((previous, _worsened(previous, risk), *site, period_start))
+            last = (site, risk)
+        conn.executemany(
+            'UPDATE rollup_sites SET previous_risk_level = ?, worsened = ? WHERE portfolio_id = ? '
+            'AND analysis_type = ? AND period = ? AND url = ? AND period_start = ?', updates
+        )
+        conn.execute('DROP TABLE IF EXISTS site_risk')
+
+
+def _summary(sites, score_sum, grade_counts):
+    return {
+        'sites': sites,
+        'average_score': round(score_sum / sites, 1) if sites else None,
+        'grade_distribution': dict(zip(GRADES, grade_counts))
+    }
+
+
+def read_dashboard(conn, portfolio_id, analysis_type='quick', period='week', period_start=None,
+                   business_type=None, top_issues=10, worsening_limit=50):
+    """A portfolio's dashboard for one period, read from the rollup tables only.
+
+    Without period_start the most recent period with data is used. Returns None when
+    the portfolio has no rolled-up scans.
+    """
+    if period_start is None:
+        row = conn.execute(
+            'SELECT MAX(period_start) FROM rollups WHERE portfolio_id = ? AND analysis_type = ? AND period = ?',
+            (portfolio_id, analysis_type, period)
+        ).fetchone()
+        period_start = row[0]
+        if period_start is None:
+            return None
+    else:
+        period_start = period_starts(period_start)[period]
+
+    key = (portfolio_id, analysis_type, period, period_start)
+    where = 'portfolio_id = ? AND analysis_type = ? AND period = ? AND period_start = ?'
+    params = key
+    if business_type:
+        where += ' AND business_type = ?'
+        params = key + (business_type,)
+
+    breakdown = {}
+    sites = score_sum = 0
+    grade_totals = [0] * len(GRADES)
+    for row in conn.execute(
+        f'SELECT business_type, sites, score_sum, grade_a, grade_b, grade_c, grade_d, grade_f FROM rollups '
+        f'WHERE {where} AND sites > 0 ORDER BY business_type', params
+    ):
+        breakdown[row[0]] = _summary(row[1], row[2], row[3:])
+        breakdown[row[0]]['top_issues'] = []
+        sites += row[1]
+        score_sum += row[2]
+        grade_totals = [total + count for total, count in zip(grade_totals, row[3:])]
+
+    # Per business type, then overall; a few dozen rows per period at most
+    issue_totals = {}
+    for bt, issue, count in conn.execute(
+        f'SELECT business_type, issue, sites FROM rollup_issues WHERE {where} AND sites > 0 ORDER BY sites DESC',
+        params
+    ):
+        if bt in breakdown and len(breakdown[bt]['top_issues']) < top_issues:
+            breakdown[bt]['top_issues'].append({'issue': issue, 'sites': count})
+        issue_totals[issue] = issue_totals.get(issue, 0) + count
+
+    # Sites whose latest risk this period is worse than in the last period they were scanned in
+    # (without the index hint the listing walks every site of the period looking for worsened ones)
+    risk_where = where + ' AND worsened = 1'
+    worsening_count = conn.execute(f'SELECT COUNT(*) FROM rollup_sites WHERE {risk_where}', params).fetchone()[0]
+    worsening = [
+        {'url': url, 'business_type': bt, 'from': previous, 'to': current, 'scanned_at': scanned_at}
+        for url, bt, previous, current, scanned_at in conn.execute(
+            f'SELECT url, business_type, previous_risk_level, risk_level, scanned_at FROM rollup_sites '
+            f'INDEXED BY rollup_sites_worsened WHERE {risk_where} LIMIT ?', params + (worsening_limit,)
+        )
+    ]
+
+    dashboard = _summary(sites, score_sum, grade_totals)
+    dashboard.update({
+        'portfolio_id': portfolio_id,
+        'analysis_type': analysis_type,
+        'period': period,
+        'period_start': period_start,
+        'top_issues': [
+            {'issue': issue, 'sites': count}
+            for issue, count in sorted(issue_totals.items(), key=lambda item: -item[1])[:top_issues]
+        ],
+        'business_types': breakdown,
+        'worsening_risk': {'count': worsening_count, 'sites': worsening}
+    })
+    return dashboard
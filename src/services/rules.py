@@ -0,0 +1,339 @@
+import os
+import re
+import threading
+import time
+
+import soupsieve
+from bs4 import Tag
+
+from services.accname import AccessibleNames
+from services.profiling import section
+
+try:
+    from soupsieve.css_match import CSSMatch
+except ImportError:
+    CSSMatch = None
+
+# Link names that say nothing about where the link goes
+VAGUE_LINK_TEXT = frozenset(['click here', 'read more', 'more', 'here', 'link', 'this'])
+
+# Longest opening-tag snippet kept per offending element
+SNIPPET_LENGTH = 120
+
+
+def _matcher(compiled, root):
+    """A match(element) function for elements of root's document.
+
+    select() builds one CSSMatch per call and reuses it for every element, while the
+    public SoupSieve.match() builds one per element (about 1.7x slower here). CSSMatch
+    is private, so it is only used with the soupsieve 2.x constructor it was written
+    against; anything else falls back to the public API.
+    """
+    if CSSMatch is not None and soupsieve.__version_info__.major == 2:
+        try:
+            return CSSMatch(compiled.selectors, root, compiled.namespaces, compiled.flags).match
+        except (TypeError, AttributeError):
+            pass
+    return compiled.match
+
+
+def _snippet(element):
+    attrs = ''.join(
+        f' {name}="{" ".join(value) if isinstance(value, list) else value}"'
+        for name, value in element.attrs.items()
+    )
+    tag = f'<{element.name}{attrs}>'
+    return tag if len(tag) <= SNIPPET_LENGTH else tag[:SNIPPET_LENGTH - 3] + '...'
+
+
+class Document:
+    """A parsed page as seen by the rules, with lazily built shared indexes."""
+
+    def __init__(self, soup):
+        self.soup = soup
+        self._names = None
+        self._elements = {}
+        self._paths = {}
+        self._nth = {}
+
+    def elements(self, root):
+        """Every element under root in document order, collected in one walk and shared by all rules."""
+        key = id(root)
+        if key not in self._elements:
+            self._elements[key] = [node for node in root.descendants if isinstance(node, Tag)]
+        return self._elements[key]
+
+    def locate(self, element):
+        """(css_path, line, column, snippet) pinpointing element in the source; line/column are 1-based."""
+        column = element.sourcepos + 1 if element.sourcepos is not None else None
+        return self.css_path(element), element.sourceline, column, _snippet(element)
+
+    def css_path(self, element):
+        """Selector for element, anchored at the nearest ancestor with an id.
+
+        Paths and sibling positions are memoized, so locating every element of a large
+        page stays linear.
+        """
+        chain = []
+        node = element
+        while isinstance(node, Tag) and node.name != '[document]' and id(node) not in self._paths:
+            chain.append(node)
+            node = node.parent
+        path = self._paths.get(id(node), '')
+        for node in reversed(chain):
+            if node.get('id'):
+                path = f"{node.name}#{soupsieve.escape(node['id'])}"
+            else:
+                segment = node.name + self._nth_of_type(node)
+                path = f'{path} > {segment}' if path else segment
+            self._paths[id(node)] = path
+        return path
+
+    def _nth_of_type(self, node):
+        parent = node.parent
+        if parent is None:
+            return ''
+        positions = self._nth.get(id(parent))
+        if positions is None:
+            # One pass over the parent's children: position among same-named siblings, and how many there are
+            positions = {}
+            counts = {}
+            for child in parent.children:
+                if isinstance(child, Tag):
+                    counts[child.name] = counts.get(child.name, 0) + 1
+                    positions[id(child)] = (child.name, counts[child.name])
+            positions = self._nth[id(parent)] = {
+                key: f':nth-of-type({position})' if counts[name] > 1 else ''
+                for key, (name, position) in positions.items()
+            }
+        return positions[id(node)]
+
+    @property
+    def names(self):
+        if self._names is None:
+            with section('accessible_names'):
+                self._names = AccessibleNames(self.soup)
+        return self._names
+
+
+class Rule:
+    """One check, defined once and shared by every endpoint.
+
+    Element rules flag each element matched by selector for which predicate(element,
+    doc) is true; example(element, doc) describes it. Document rules get the whole
+    match list and return a list of findings (strings), empty when the page passes.
+    key names the rule's entry in AccessibilityAnalyzer.wcag_guidelines.
+    """
+
+    def __init__(self, key, selector, predicate, severity, summary, example=None, scope='element'):
+        self.key = key
+        self.selector = selector
+        # Compiled once at registration instead of on every select() call
+        self.compiled = soupsieve.compile(selector) if selector else None
+        # Tag names the selector can match (None for '*'), so most elements are
+        # ruled out by a set lookup instead of a full selector match
+        self.tags = None
+        if self.compiled:
+            names = {item.tag.name if item.tag else '*' for item in self.compiled.selectors}
+            self.tags = None if '*' in names else frozenset(names)
+        # Plain tag lists ('h1, h2') are fully decided by the tag lookup
+        self.tags_only = bool(selector) and re.fullmatch(r'\s*\w+(\s*,\s*\w+)*\s*', selector) is not None
+        self.predicate = predicate
+        self.severity = severity
+        self.summary = summary
+        self.example = example
+        self.scope = scope
+
+    def evaluate(self, doc, root, skip=None):
+        matches = []
+        if self.compiled:
+            matches = doc.elements(root)
+            if self.tags is not None:
+                matches = [element for element in matches if element.name in self.tags]
+            if not self.tags_only:
+                match = _matcher(self.compiled, root)
+                matches = [element for element in matches if match(element)]
+        if self.scope == 'document':
+            return [], self.predicate(matches, doc)
+        elements = [element for element in matches
+                    if not (skip and skip(element)) and self.predicate(element, doc)]
+        examples = [self.example(element, doc) for element in elements] if self.example else []
+        return elements, examples
+
+
+class RuleRegistry:
+    """Every check the analyzers run, keyed by wcag_guidelines key, in report order."""
+
+    def __init__(self):
+        self._rules = {}
+        self._disabled = set()
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def rule(self, key, selector, severity, summary, example=None, scope='element'):
+        """Decorator registering the decorated function as the rule's predicate."""
+        def decorator(predicate):
+            self._rules[key] = Rule(key, selector, predicate, severity, summary, example, scope)
+            self._timings[key] = [0, 0.0]
+            return predicate
+        return decorator
+
+    def __getitem__(self, key):
+        return self._rules[key]
+
+    def enable(self, key):
+        self._check(key)
+        self._disabled.discard(key)
+
+    def disable(self, key):
+        self._check(key)
+        self._disabled.add(key)
+
+    def _check(self, key):
+        if key not in self._rules:
+            raise KeyError(f'Unknown rule: {key}')
+
+    def is_enabled(self, key):
+        return key not in self._disabled
+
+    def run(self, doc, keys, root=None, skip=None):
+        """Run the enabled rules among keys over doc and return the ones that fail.
+
+        Each failure is a dict with key, severity, summary, count, elements (element
+        rules only) and examples. root limits element matching to a subtree; skip
+        excludes elements from element rules (document rules always see the whole page).
+        """
+        root = doc.soup if root is None else root
+        failures = []
+        for key in keys:
+            if key in self._disabled:
+                continue
+            rule = self._rules[key]
+            started = time.perf_counter()
+            with section(key):
+                elements, examples = rule.evaluate(doc, root, skip)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                timing = self._timings[key]
+                timing[0] += 1
+                timing[1] += elapsed
+            if elements or examples:
+                failures.append({
+                    'key': key,
+                    'severity': rule.severity,
+                    'summary': rule.summary,
+                    'count': len(elements) if rule.scope == 'element' else len(examples),
+                    'elements': elements,
+                    'examples': examples
+                })
+        return failures
+
+    def stats(self):
+        with self._lock:
+            return {
+                key: {
+                    'enabled': key not in self._disabled,
+                    'runs': runs,
+                    'total_ms': round(seconds * 1000, 1),
+                    'average_ms': round(seconds * 1000 / runs, 3) if runs else None
+                }
+                for key, (runs, seconds) in self._timings.items()
+            }
+
+
+rules = RuleRegistry()
+
+
+@rules.rule('images_without_alt', 'img', 'critical', 'Images missing alt text',
+            example=lambda img, doc: f"Image: {img.get('src', 'Unknown source')}")
+def _missing_alt(img, doc):
+    # Whitespace-only alt is read out as nothing, same as a missing one
+    return not (img.get('alt') or '').strip()
+
+
+@rules.rule('missing_page_title', 'title', 'critical', 'Missing or empty page title', scope='document')
+def _missing_title(titles, doc):
+    if not titles or not titles[0].get_text().strip():
+        return ['Page has no title or an empty one']
+    return []
+
+
+def _unlabeled_example(control, doc):
+    if control.name == 'button':
+        example = 'Button without accessible name'
+    else:
+        example = f"{control.get('type', 'text').title()} input without label"
+    dangling = doc.names.dangling_labelledby(control)
+    if dangling:
+        example += f" (aria-labelledby points to missing id {', '.join(dangling)})"
+    return example
+
+
+@rules.rule('forms_without_labels', 'input:not([type="hidden" i]), textarea, select, button', 'critical',
+            'Form fields without proper labels', example=_unlabeled_example)
+def _unlabeled(control, doc):
+    return not doc.names.name(control)
+
+
+@rules.rule('improper_heading_structure', 'h1, h2, h3, h4, h5, h6', 'warning', 'Improper heading structure',
+            scope='document')
+def _heading_structure(headings, doc):
+    if not headings:
+        return ['No headings found on page']
+    h1_count = sum(1 for heading in headings if heading.name == 'h1')
+    if h1_count == 0:
+        return ['Missing H1 heading']
+    if h1_count > 1:
+        return [f'Multiple H1 headings found ({h1_count})']
+    return []
+
+
+def _link_example(link, doc):
+    text = doc.names.name(link)
+    href = link['href']
+    return f'Link "{text}": {href}' if text else f'Link without text: {href}'
+
+
+@rules.rule('non_descriptive_links', 'a[href]', 'warning', 'Links with vague or missing text',
+            example=_link_example)
+def _vague_link(link, doc):
+    text = doc.names.name(link)
+    return not text or text.lower() in VAGUE_LINK_TEXT or len(text) < 3
+
+
+@rules.rule('missing_skip_links', 'a[href^="#"]', 'warning', 'No skip navigation link', scope='document')
+def _missing_skip_link(links, doc):
+    for link in links:
+        text = doc.names.name(link).lower()
+        if 'skip' in text and ('content' in text or 'main' in text):
+            return []
+    return ['No "skip to main content" link found']
+
+
+@rules.rule('missing_lang_attribute', 'html', 'warning', 'Missing language declaration', scope='document')
+def _missing_lang(html_tags, doc):
+    if not html_tags or not html_tags[0].get('lang'):
+        return ['The html element has no lang attribute']
+    return []
+
+
+@rules.rule('poor_color_contrast', None, 'critical', 'Possible color contrast issues', scope='document')
+def _color_contrast(matches, doc):
+    # Simulated: real contrast checking needs computed CSS
+    if len(doc.soup.find_all(string=True)) > 50:  # If page has substantial content
+        return ['Text elements may have insufficient contrast - manual review recommended']
+    return []
+
+
+@rules.rule('inaccessible_focus_indicators', 'a, button, input, select, textarea', 'warning',
+            'Focus indicators need review', scope='document')
+def _focus_indicators(interactive_elements, doc):
+    # Simulated: flags pages with many interactive elements for manual review
+    if len(interactive_elements) > 5:
+        return [f'{len(interactive_elements)} interactive elements - check each has a visible focus style']
+    return []
+
+
+# SCAN_DISABLED_RULES: comma-separated rule keys to switch off without a deploy
+for _key in filter(None, (key.strip() for key in os.environ.get('SCAN_DISABLED_RULES', '').split(','))):
+    rules.disable(_key)
@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from services import rollups
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'scans.db')
+
+# zlib only looks back 32KB, so a larger dictionary would be wasted
+DICTIONARY_SIZE = 32 * 1024
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL UNIQUE,
+    data BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    hash TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    dictionary_id INTEGER REFERENCES dictionaries(id),
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    snapshot_hash TEXT REFERENCES snapshots(hash),
+    analysis_type TEXT NOT NULL,
+    business_type TEXT NOT NULL,
+    ruleset_version TEXT NOT NULL,
+    grade TEXT,
+    compliance_score INTEGER,
+    risk_level TEXT,
+    result TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    portfolio_id TEXT,
+    regraded_from TEXT,
+    frame_snapshots TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_url ON scans(url, analysis_type, created_at);
+CREATE INDEX IF NOT EXISTS scans_created_at ON scans(created_at);
+CREATE TABLE IF NOT EXISTS scan_elements (
+    scan_id TEXT NOT NULL,
+    issue TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    line INTEGER,
+    column INTEGER,
+    snippet TEXT NOT NULL,
+    PRIMARY KEY (scan_id, issue, seq)
+) WITHOUT ROWID;
+'''
+
+
+def _host(url):
+    return (urlsplit(url).hostname or '').lower()
+
+
+class ScanStore:
+    """Content-addressed, dictionary-compressed HTML snapshots plus the scans graded from them.
+
+    Snapshots are keyed by the SHA-256 of the raw document, so re-fetching an unchanged
+    page stores nothing new. The first page seen for a host seeds that host's zlib preset
+    dictionary; later pages from the same site compress against it, which is where most
+    of the savings come from since sites repeat their markup on every page.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('SCAN_STORE_PATH', DEFAULT_STORE_PATH)
+        self._local = threading.local()
+        self._dictionaries = {}
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        # One connection per thread, opened (and the schema ensured) on first use
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Older stores lack the columns CREATE TABLE would add
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(scans)')]
+            for column in ('portfolio_id', 'regraded_from', 'frame_snapshots'):
+                if columns and column not in columns:
+                    conn.execute(f'ALTER TABLE scans ADD COLUMN {column} TEXT')
+            rollups.migrate(conn)
+            conn.executescript(SCHEMA + rollups.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _dictionary_for_host(self, host):
+        # Returns (id, data) or None; dictionaries never change once created
+        with self._lock:
+            if host in self._dictionaries:
+                return self._dictionaries[host]
+        row = self._conn().execute('SELECT id, data FROM dictionaries WHERE host = ?', (host,)).fetchone()
+        entry = (row[0], bytes(row[1])) if row else None
+        if entry:
+            with self._lock:
+                self._dictionaries[host] = entry
+        return entry
+
+    def _dictionary_by_id(self, dictionary_id):
+        with self._lock:
+            for entry in self._dictionaries.values():
+                if entry and entry[0] == dictionary_id:
+                    return entry[1]
+        row = self._conn().execute('SELECT host, data FROM dictionaries WHERE id = ?', (dictionary_id,)).fetchone()
+        with self._lock:
+            self._dictionaries[row[0]] = (dictionary_id, bytes(row[1]))
+        return bytes(row[1])
+
+    def put_snapshot(self, url, html):
+        """Store a fetched document and return its content hash."""
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+        digest = hashlib.sha256(html).hexdigest()
+        conn = self._conn()
+        if conn.execute('SELECT 1 FROM snapshots WHERE hash = ?', (digest,)).fetchone():
+            return digest
+
+        host = _host(url)
+        dictionary = self._dictionary_for_host(host)
+        if dictionary is None:
+            # Keep the start and end of the page: that's where shared head/nav/footer markup lives
+            half = DICTIONARY_SIZE // 2
+            seed = html if len(html) <= DICTIONARY_SIZE else html[:half] + html[-half:]
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO dictionaries (host, data, created_at) VALUES (?, ?, ?)',
+                             (host, seed, datetime.now().isoformat()))
+            dictionary = self._dictionary_for_host(host)
+
+        compressor = zlib.compressobj(9, zdict=dictionary[1])
+        data = compressor.compress(html) + compressor.flush()
+        with conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO snapshots (hash, host, dictionary_id, size, data, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (digest, host, dictionary[0], len(html), data, datetime.now().isoformat())
+            )
+        return digest
+
+    def get_snapshot(self, digest):
+        row = self._conn().execute('SELECT dictionary_id, data FROM snapshots WHERE hash = ?', (digest,)).fetchone()
+        if row is None:
+            return None
+        dictionary_id, data = row
+        if dictionary_id is None:
+            return zlib.decompress(data)
+        decompressor = zlib.decompressobj(zdict=self._dictionary_by_id(dictionary_id))
+        return decompressor.decompress(data) + decompressor.flush()
+
+    def record_scan(self, result, snapshot_hash, business_type='default', portfolio_id=None, elements=None,
+                    regraded_from=None, frame_snapshots=None):
+        """Save a scan result and fold it into the dashboard rollups in the same transaction.
+
+        elements maps an issue key to the (css_path, line, column, snippet) of every
+        offending element; they are served page by page from iter_scan_elements().
+        regraded_from is the scan_id a re-grade of an old snapshot replays. Re-grades stay
+        out of the rollups: they say nothing about the site on the day they were run, and
+        a risk change caused by new rules isn't the site getting worse. frame_snapshots
+        maps each scanned frame's URL to its snapshot hash, so re-grades can replay frames.
+        """
+        created_at = result.get('timestamp') or datetime.now().isoformat()
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO scans (scan_id, url, host, snapshot_hash, analysis_type, business_type, '
+                'ruleset_version, grade, compliance_score, risk_level, result, created_at, portfolio_id, '
+                'regraded_from, frame_snapshots) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (result['scan_id'], result['url'], _host(result['url']), snapshot_hash,
+                 result.get('analysis_type', 'quick'), business_type, result.get('ruleset_version', ''),
+                 result.get('grade'), result.get('compliance_score'), result.get('risk_level'),
+                 json.dumps(result), created_at, portfolio_id, regraded_from,
+                 json.dumps(frame_snapshots) if frame_snapshots is not None else None)
+            )
+            if elements is not None:
+                conn.execute('DELETE FROM scan_elements WHERE scan_id = ?', (result['scan_id'],))
+                conn.executemany(
+                    'INSERT INTO scan_elements (scan_id, issue, seq, path, line, column, snippet) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ((result['scan_id'], issue, seq) + tuple(location)
+                     for issue, locations in elements.items() for seq, location in enumerate(locations, 1))
+                )
+            if regraded_from is None:
+                self._apply_rollups(conn, result, business_type, portfolio_id, created_at)
+
+    def _apply_rollups(self, conn, result, business_type, portfolio_id, created_at):
+        if not result.get('grade'):
+            return
+        rollups.apply_scan(conn, {
+            'scan_id': result['scan_id'],
+            'url': result['url'],
+            'portfolio_id': portfolio_id,
+            'business_type': business_type,
+            'analysis_type': result.get('analysis_type', 'quick'),
+            'scanned_at': created_at,
+            'score': result.get('compliance_score'),
+            'grade': result['grade'],
+            'risk_level': result.get('risk_level'),
+            'issues': rollups.scan_issues(result)
+        })
+
+    def has_scan(self, scan_id):
+        return self._conn().execute('SELECT 1 FROM scans WHERE scan_id = ?', (scan_id,)).fetchone() is not None
+
+    def iter_scan_elements(self, scan_id, issue, after=0, path=None, contains=None, batch_size=500):
+        """Offending elements of one issue in a scan, in document order, after position after.
+
+        Yields (seq, path, line, column, snippet). path keeps elements whose CSS path starts
+        with it; contains keeps those whose path or snippet include it. Rows are streamed
+        in batches, so walking a scan's elements uses constant memory however many there are.
+        """
+        query = 'SELECT seq, path, line, column, snippet FROM scan_elements WHERE scan_id = ? AND issue = ? AND seq > ?'
+        params = [scan_id, issue, after]
+        if path:
+            query += ' AND substr(path, 1, length(?)) = ?'
+            params.extend([path, path])
+        if contains:
+            query += ' AND (instr(path, ?) > 0 OR instr(snippet, ?) > 0)'
+            params.extend([contains, contains])
+        cursor = self._conn().execute(query + ' ORDER BY seq', params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def iter_latest_scans(self, analysis_type=None, batch_size=1000):
+        """Most recent scan per (url, analysis_type), streamed in batches."""
+        query = (
+            'SELECT scan_id, url, snapshot_hash, analysis_type, business_type, ruleset_version, grade, compliance_score, '
+            'portfolio_id, frame_snapshots FROM scans s WHERE snapshot_hash IS NOT NULL AND created_at = ('
+            'SELECT MAX(created_at) FROM scans WHERE url = s.url AND analysis_type = s.analysis_type)'
+        )
+        params = ()
+        if analysis_type:
+            query += ' AND analysis_type = ?'
+            params = (analysis_type,)
+        cursor = self._conn().execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def backfill_rollups(self, since=None, batch_size=1000):
+        """Fold stored live scans (optionally only those created since an ISO date) into the rollups.
+
+        Rollup updates are idempotent, so this can be re-run, or run while new scans are
+        being recorded, without double counting. Commits every batch_size scans.
+        """
+        conn = self._conn()
+        # Separate read connection so committing batches doesn't disturb the scan being iterated
+        reader = sqlite3.connect(self.path, timeout=30)
+        query = ('SELECT result, business_type, portfolio_id, created_at FROM scans '
+                 'WHERE grade IS NOT NULL AND regraded_from IS NULL')
+        params = ()
+        if since:
+            query += ' AND created_at >= ?'
+            params = (since,)
+        applied = 0
+        try:
+            cursor = reader.execute(query + ' ORDER BY created_at', params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                with conn:
+                    for result, business_type, portfolio_id, created_at in rows:
+                        self._apply_rollups(conn, json.loads(result), business_type, portfolio_id, created_at)
+                applied += len(rows)
+        finally:
+            reader.close()
+        return applied
+
+    def dashboard(self, portfolio_id, **options):
+        return rollups.read_dashboard(self._conn(), portfolio_id, **options)
+
+    def stats(self):
+        conn = self._conn()
+        snapshots, raw_bytes, stored_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM snapshots'
+        ).fetchone()
+        dictionary_bytes = conn.execute('SELECT COALESCE(SUM(LENGTH(data)), 0) FROM dictionaries').fetchone()[0]
+        return {
+            'snapshots': snapshots,
+            'scans': conn.execute('SELECT COUNT(*) FROM scans').fetchone()[0],
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes + dictionary_bytes,
+            'compression_ratio': round(raw_bytes / (stored_bytes + dictionary_bytes), 2) if stored_bytes else None
+        }
@@ -0,0 +1,180 @@
+import math
+import re
+
+from bs4 import Comment, Tag
+
+# Elements the per-element checks look at; subtrees without any are never worth deduplicating
+CHECKED_TAGS = frozenset(['img', 'input', 'textarea', 'select', 'button', 'a'])
+
+PLACEHOLDER_TAG = 'ada-template-block'
+
+
+def _attrs(tag):
+    return tuple(sorted(
+        (name, ' '.join(value) if isinstance(value, list) else value)
+        for name, value in tag.attrs.items()
+    ))
+
+
+def _signatures(root):
+    """Structural hash of every element under root, computed bottom-up in one pass.
+
+    Returns {id(element): (signature, contains_checked_element)}. Iterative so deeply
+    nested pages don't hit the recursion limit.
+    """
+    signatures = {}
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children if isinstance(child, Tag))
+            continue
+        parts = []
+        checked = node.name in CHECKED_TAGS
+        for child in node.children:
+            if isinstance(child, Tag):
+                signature, child_checked = signatures[id(child)]
+                parts.append(signature)
+                checked = checked or child_checked
+            elif not isinstance(child, Comment):
+                text = child.strip()
+                if text:
+                    parts.append(text)
+        signatures[id(node)] = (hash((node.name, _attrs(node), tuple(parts))), checked)
+    return signatures
+
+
+def _raw_source(markup, line_starts, element):
+    """The exact markup an element was parsed from, or None if it can't be located."""
+    if element.sourceline is None:
+        return None
+    start = line_starts[element.sourceline - 1] + element.sourcepos
+    tag_pattern = re.compile(r'<(/?)%s\b[^>]*>' % re.escape(element.name), re.I)
+    depth = 0
+    for match in tag_pattern.finditer(markup, start):
+        if match.start() == start and match.group(1):
+            return None
+        if match.group(1):
+            depth -= 1
+        elif not match.group(0).endswith('/>'):
+            depth += 1
+        if depth == 0:
+            return markup[start:match.end()]
+    return None
+
+
+def describe(tag):
+    """Short CSS-like label for a block, e.g. header#top.site-header."""
+    label = tag.name
+    if tag.get('id'):
+        label += f"#{tag['id']}"
+    classes = tag.get('class') or []
+    if classes:
+        label += '.' + '.'.join(classes[:2])
+    return label
+
+
+class SiteTemplate:
+    """Subtrees shared verbatim by many pages of one site (header, nav, footer, banners).
+
+    The template is learned from a sample of fully parsed pages: a block counts when the
+    same structural hash appears on at least min_share of them (and on two or more).
+    Only the outermost shared block is kept, and only blocks containing something the
+    per-element checks inspect.
+
+    For every other page the blocks' exact markup is cut out before parsing (reduce())
+    and the single parsed copy is spliced back in afterwards (attach()), so page-level
+    checks still see a complete document while the template is parsed only once.
+    """
+
+    def __init__(self, sample, min_share=0.5):
+        # sample: list of (markup, soup) pairs parsed from that markup
+        threshold = max(2, math.ceil(min_share * len(sample)))
+        page_signatures = []
+        occurrences = {}
+        for index, (markup, soup) in enumerate(sample):
+            body = soup.body or soup
+            signatures = _signatures(body)
+            page_signatures.append(signatures)
+            for element in body.find_all(True):
+                signature, checked = signatures[id(element)]
+                if checked:
+                    occurrences.setdefault(signature, set()).add(index)
+
+        shared = {signature for signature, pages in occurrences.items() if len(pages) >= threshold}
+
+        # Per sample page, the outermost elements whose subtree is shared
+        self.blocks = []
+        by_signature = {}
+        self._sample_roots = []
+        self._sample_blocks = []
+        for index, (markup, soup) in enumerate(sample):
+            body = soup.body or soup
+            signatures = page_signatures[index]
+            line_starts = None
+            roots = set()
+            blocks = []
+            pending = [child for child in body.children if isinstance(child, Tag)]
+            while pending:
+                element = pending.pop()
+                signature = signatures[id(element)][0]
+                if signature not in shared:
+                    pending.extend(child for child in element.children if isinstance(child, Tag))
+                    continue
+                roots.add(id(element))
+                if signature in by_signature:
+                    by_signature[signature]['pages'] += 1
+                    blocks.append(by_signature[signature])
+                    continue
+                if line_starts is None:
+                    line_starts = [0] + [match.end() for match in re.finditer('\n', markup)]
+                by_signature[signature] = {
+                    'element': element,
+                    'soup': soup,
+                    'raw': _raw_source(markup, line_starts, element),
+                    'pages': 1
+                }
+                self.blocks.append(by_signature[signature])
+                blocks.append(by_signature[signature])
+            self._sample_roots.append(roots)
+            self._sample_blocks.append(blocks)
+
+    def sample_skipper(self, index):
+        """Predicate telling the analysis which elements of a sample page are template."""
+        return self._skipper(self._sample_roots[index])
+
+    def sample_blocks(self, index):
+        """Template blocks found on a sample page, once per occurrence."""
+        return self._sample_blocks[index]
+
+    def reduce(self, markup):
+        """Cut known template blocks out of raw markup, leaving placeholders."""
+        for number, block in enumerate(self.blocks):
+            raw = block['raw']
+            if raw and raw in markup:
+                markup = markup.replace(raw, f'<{PLACEHOLDER_TAG} data-block="{number}"></{PLACEHOLDER_TAG}>', 1)
+        return markup
+
+    def attach(self, soup):
+        """Splice parsed template blocks into a reduced page; returns (blocks, skip predicate)."""
+        attached = []
+        for placeholder in soup.find_all(PLACEHOLDER_TAG):
+            block = self.blocks[int(placeholder['data-block'])]
+            block['pages'] += 1
+            placeholder.replace_with(block['element'].extract())
+            attached.append(block)
+        return attached, self._skipper({id(block['element']) for block in attached})
+
+    def _skipper(self, roots):
+        if not roots:
+            return None
+
+        def in_template(element):
+            while element is not None:
+                if id(element) in roots:
+                    return True
+                element = element.parent
+            return False
+
+        return in_template
@@ -0,0 +1,169 @@
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from services.host_health import HostCircuitOpen, HostHealthTracker
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """/ok answers at once, /delay?s=<seconds> after a pause, /reset drops the connection."""
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        self.server.hits += 1
+        if parts.path == '/reset':
+            # SO_LINGER 0 makes close() send RST instead of FIN
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.connection.close()
+            self.close_connection = True
+            return
+        if parts.path == '/delay':
+            time.sleep(float(parse_qs(parts.query)['s'][0]))
+        try:
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+        except OSError:
+            pass  # the client gave up first
+
+    def finish(self):
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.hits = 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd, f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _state(tracker):
+    return tracker.stats()['unhealthy_hosts'].get('127.0.0.1', {}).get('state', 'closed')
+
+
+def test_timeout_adapts_to_observed_latency(server):
+    _, base = server
+    tracker = HostHealthTracker(min_timeout=0.2, timeout_factor=4.0, min_samples=5)
+    assert tracker.timeout_for('127.0.0.1', 5) == 5  # no samples yet: the caller's timeout
+    for _ in range(5):
+        tracker.get(f'{base}/ok', timeout=5)
+    assert tracker.timeout_for('127.0.0.1', 5) == 0.2  # a fast host gets min_timeout
+
+    # Well inside the caller's 5s, but far slower than this host usually is
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        tracker.get(f'{base}/delay?s=1', timeout=5)
+    assert time.monotonic() - started < 0.8
+
+
+def test_callers_timeout_wins_below_min_timeout(server):
+    _, base = server
+    tracker = HostHealthTracker(min_timeout=2.0, min_samples=1)
+    tracker.get(f'{base}/ok', timeout=5)
+    assert tracker.timeout_for('127.0.0.1', 0.3) == 0.3
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast(server):
+    httpd, base = server
+    tracker = HostHealthTracker(failure_threshold=3, cooldown=30)
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            tracker.get(f'{base}/reset', timeout=5)
+    assert _state(tracker) == 'open'
+
+    hits = httpd.hits
+    started = time.monotonic()
+    with pytest.raises(HostCircuitOpen) as excinfo:
+        tracker.get(f'{base}/ok', timeout=5)
+    assert time.monotonic() - started < 0.05
+    assert httpd.hits == hits  # never reached the network
+    assert excinfo.value.host == '127.0.0.1'
+    assert tracker.stats()['unhealthy_hosts']['127.0.0.1']['rejected'] == 1
+
+
+def test_success_resets_the_failure_streak(server):
+    _, base = server
+    tracker = HostHealthTracker(failure_threshold=2)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        tracker.get(f'{base}/reset', timeout=5)
+    tracker.get(f'{base}/ok', timeout=5)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        tracker.get(f'{base}/reset', timeout=5)
+    assert _state(tracker) == 'closed'
+
+
+def _open(tracker, base):
+    for _ in range(tracker.failure_threshold):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            tracker.get(f'{base}/reset', timeout=5)
+    assert _state(tracker) == 'open'
+
+
+def test_half_open_probe_success_closes_the_circuit(server):
+    _, base = server
+    tracker = HostHealthTracker(failure_threshold=2, cooldown=0.2)
+    _open(tracker, base)
+    time.sleep(0.25)
+    assert tracker.get(f'{base}/ok', timeout=5).status_code == 200
+    assert _state(tracker) == 'closed'
+    assert tracker.get(f'{base}/ok', timeout=5).status_code == 200
+
+
+def test_half_open_probe_failure_reopens_the_circuit(server):
+    httpd, base = server
+    tracker = HostHealthTracker(failure_threshold=2, cooldown=0.2)
+    _open(tracker, base)
+    time.sleep(0.25)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        tracker.get(f'{base}/reset', timeout=5)
+    assert _state(tracker) == 'open'
+
+    hits = httpd.hits
+    with pytest.raises(HostCircuitOpen):
+        tracker.get(f'{base}/ok', timeout=5)
+    assert httpd.hits == hits
+
+
+def test_only_one_probe_while_half_open(server):
+    _, base = server
+    tracker = HostHealthTracker(failure_threshold=2, cooldown=0.2)
+    _open(tracker, base)
+    time.sleep(0.25)
+    probe = threading.Thread(target=tracker.get, args=(f'{base}/delay?s=0.5',), kwargs={'timeout': 5})
+    probe.start()
+    time.sleep(0.1)
+    with pytest.raises(HostCircuitOpen):
+        tracker.get(f'{base}/ok', timeout=5)
+    probe.join()
+    assert _state(tracker) == 'closed'
+
+
+def test_budget_capped_timeouts_are_not_held_against_the_host(server):
+    _, base = server
+    tracker = HostHealthTracker(failure_threshold=2)
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.Timeout):
+            tracker.get(f'{base}/delay?s=1', timeout=5, budget=0.1)
+    assert _state(tracker) == 'closed'
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.Timeout):
+            tracker.get(f'{base}/delay?s=1', timeout=0.1, budget=5)
+    assert _state(tracker) == 'open'